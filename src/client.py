@@ -1,20 +1,49 @@
-import argparse
 import os
 import platform
+import select
 import socket
+import struct
 import subprocess
 import sys
-from enum import Enum
-from typing import Optional, Tuple
+import time
+from enum import IntEnum
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import argparse
 
 if platform.system() == "Windows":
     import pyperclip
 
-from config import DEFAULT_LANGUAGE, HOST, MAX_SPEED, MIN_SPEED, PORT
-from utils import display_languages, display_voices, get_language_map, get_voices
-
-
-class Action(Enum):
+try:
+    from Xlib import X
+    from Xlib import display as xdisplay
+except ImportError:
+    xdisplay = None
+
+from config import (
+    DEFAULT_LANGUAGE,
+    HOST,
+    MAX_SPEED,
+    MIN_SPEED,
+    OP_BACK,
+    OP_EXIT,
+    OP_LANG,
+    OP_NEXT,
+    OP_PAUSE,
+    OP_RESUME,
+    OP_SPEED,
+    OP_STATUS,
+    OP_STOP,
+    OP_VOICE,
+    PORT,
+    SOCKET_PATH,
+    TIMEOUT,
+    normalize_long_options,
+)
+
+
+class Action(IntEnum):
     NONE = 0
     STOP = 1
     PAUSE = 2
@@ -32,28 +61,60 @@ ACTION_MAPPING = {
     "back": Action.BACK,
     "exit": Action.EXIT,
 }
+ACTION_ITEMS = tuple(ACTION_MAPPING.items())
 
 ACTION_COMMANDS = {
-    Action.EXIT: "!exit",
-    Action.STOP: "!stop",
-    Action.PAUSE: "!pause",
-    Action.RESUME: "!resume",
-    Action.NEXT: "!next",
-    Action.BACK: "!back",
+    Action.EXIT: bytes([OP_EXIT]),
+    Action.STOP: bytes([OP_STOP]),
+    Action.PAUSE: bytes([OP_PAUSE]),
+    Action.RESUME: bytes([OP_RESUME]),
+    Action.NEXT: bytes([OP_NEXT]),
+    Action.BACK: bytes([OP_BACK]),
 }
+STATUS_COMMAND = bytes([OP_STATUS])
+
+# Windows has no AF_UNIX support, so it always talks to the daemon over TCP
+USE_TCP = not hasattr(socket, "AF_UNIX")
+
+
+def read_command_output(args: List[str], text: bool = False) -> str | bytes:
+    """Run a clipboard tool and return its stdout, like subprocess.check_output"""
+    read_fd, write_fd = os.pipe()
+    try:
+        pid = os.posix_spawnp(
+            args[0],
+            args,
+            os.environ,
+            file_actions=[
+                (os.POSIX_SPAWN_DUP2, write_fd, 1),
+                (os.POSIX_SPAWN_CLOSE, read_fd),
+            ],
+        )
+    except OSError:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    with os.fdopen(read_fd, "rb") as pipe:
+        data = pipe.read()
+    returncode = os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, args, data)
+    return data.decode("utf-8", "replace") if text else data
 
 
 def read_wayland_clipboard():
     try:
-        types = subprocess.check_output(
+        types = read_command_output(
             ["wl-paste", "--list-types"], text=True
         ).splitlines()
 
         if "image/png" in types:
-            return subprocess.check_output(["wl-paste", "--type", "image/png"])
+            return read_command_output(["wl-paste", "--type", "image/png"])
 
         if any(t.startswith("text/plain") for t in types):
-            return subprocess.check_output(["wl-paste"], text=True)
+            return read_command_output(["wl-paste"], text=True)
 
         return None
 
@@ -68,20 +129,76 @@ def read_wayland_clipboard():
         return None
 
 
+def convert_x11_selection(disp, window, selection: int, target: str):
+    """Ask the selection owner for a target and return the property reply"""
+    prop = disp.intern_atom("KOKORODOKI_SELECTION")
+    window.convert_selection(selection, disp.intern_atom(target), prop, X.CurrentTime)
+    disp.flush()
+
+    deadline = time.monotonic() + TIMEOUT
+    while True:
+        while disp.pending_events():
+            event = disp.next_event()
+            if event.type != X.SelectionNotify:
+                continue
+            if event.property == X.NONE:
+                return None
+            reply = window.get_full_property(prop, X.AnyPropertyType)
+            window.delete_property(prop)
+            if reply is None or reply.property_type == disp.intern_atom("INCR"):
+                # Large transfers are sent incrementally, leave those to xclip
+                raise RuntimeError("Incremental selection transfer")
+            return reply
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Selection owner did not respond")
+        select.select([disp], [], [], remaining)
+
+
+def read_x11_xlib(selection: str, images: bool) -> Optional[str | bytes]:
+    """Read an X11 selection directly from the X server"""
+    disp = xdisplay.Display()
+    try:
+        window = disp.screen().root.create_window(0, 0, 1, 1, 0, X.CopyFromParent)
+        selection_atom = disp.intern_atom(selection)
+
+        if images:
+            targets = convert_x11_selection(disp, window, selection_atom, "TARGETS")
+            if targets is None:
+                return None
+            if disp.intern_atom("image/png") in targets.value:
+                reply = convert_x11_selection(disp, window, selection_atom, "image/png")
+                return bytes(reply.value) if reply is not None else None
+
+        reply = convert_x11_selection(disp, window, selection_atom, "UTF8_STRING")
+        if reply is None:
+            return None
+        return reply.value.decode("utf-8")
+    finally:
+        disp.close()
+
+
 def read_x11_clipboard():
+    if xdisplay is not None:
+        try:
+            return read_x11_xlib("CLIPBOARD", images=True)
+        except Exception:
+            pass  # Fall back to xclip
+
     try:
-        types = subprocess.check_output(
+        types = read_command_output(
             ["xclip", "-selection", "clipboard", "-t", "TARGETS", "-o"],
             text=True,
         ).splitlines()
 
         if "image/png" in types:
-            return subprocess.check_output(
+            return read_command_output(
                 ["xclip", "-selection", "clipboard", "-t", "image/png", "-o"]
             )
 
         if "UTF8_STRING" in types or "STRING" in types:
-            return subprocess.check_output(
+            return read_command_output(
                 ["xclip", "-selection", "clipboard", "-o"], text=True
             )
 
@@ -100,7 +217,7 @@ def read_x11_clipboard():
 
 def read_wayland_selection():
     try:
-        return subprocess.check_output(["wl-paste", "--primary"], text=True)
+        return read_command_output(["wl-paste", "--primary"], text=True)
     except subprocess.CalledProcessError as e:
         print(f"Error reading clipboard: {e}")
         return None
@@ -113,8 +230,14 @@ def read_wayland_selection():
 
 
 def read_x11_selection():
+    if xdisplay is not None:
+        try:
+            return read_x11_xlib("PRIMARY", images=False)
+        except Exception:
+            pass  # Fall back to xclip
+
     try:
-        return subprocess.check_output(
+        return read_command_output(
             ["xclip", "-selection", "primary", "-out"], text=True
         )
     except subprocess.CalledProcessError as e:
@@ -150,55 +273,102 @@ def get_text(clipboard: bool) -> Optional[str | bytes]:
             return read_x11_clipboard()
         return read_x11_selection()
 
+
+def connect() -> socket.socket:
+    """Open a connection to the daemon"""
+    if USE_TCP:
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        address = (HOST, PORT)
+    else:
+        client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = SOCKET_PATH
+    try:
+        client_socket.connect(address)
+    except OSError:
+        client_socket.close()
+        raise
+    return client_socket
+
+
+def send_buffers(sock: socket.socket, messages: List[bytes]) -> None:
+    """Write messages with gathering sends, large payloads aren't joined first"""
+    buffers = [memoryview(message) for message in messages]
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        while buffers and sent >= len(buffers[0]):
+            sent -= len(buffers[0])
+            buffers.pop(0)
+        if buffers:
+            buffers[0] = buffers[0][sent:]
+
+
+class DaemonClient:
+    """A single daemon connection that batches messages into one write"""
+
+    def __init__(self):
+        self.messages: List[bytes] = []
+
+    def __enter__(self) -> "DaemonClient":
+        self.sock = connect()
+        return self
+
+    def send(self, message: bytes) -> None:
+        self.messages.append(message)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None and self.messages:
+                if hasattr(self.sock, "sendmsg"):
+                    send_buffers(self.sock, self.messages)
+                else:
+                    self.sock.sendall(b"".join(self.messages))
+                # The daemon reads until EOF, signal it before closing
+                self.sock.shutdown(socket.SHUT_WR)
+        finally:
+            self.sock.close()
+
+
 def send_text(clipboard: bool) -> None:
     """Send selected text or clipboard content"""
     content = get_text(clipboard)
     if content is not None:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-            client_socket.connect((HOST, PORT))
+        with DaemonClient() as client:
+            # Sent as two buffers, the clipboard content is never copied
             if isinstance(content, bytes):
-                client_socket.sendall(b"IMAGE:" + content)
+                client.send(b"IMAGE:")
+                client.send(content)
             else:
-                client_socket.sendall(b"TEXT:" + content.encode())
-
+                client.send(b"TEXT:")
+                client.send(content.encode())
 
-def send_action(action: str) -> None:
-    """Send action"""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-        client_socket.connect((HOST, PORT))
-        client_socket.sendall(action.encode())
 
+def validate_language_voice(args: "argparse.Namespace") -> None:
+    """Validate the requested language and voice"""
+    from utils import check_language_voice
 
-def send_speed(speed: float) -> None:
-    """Send new speed"""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-        client_socket.connect((HOST, PORT))
-        client_socket.sendall(f"!speed {speed}".encode())
-
-
-def send_language(language: str) -> None:
-    """Send new language"""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-        client_socket.connect((HOST, PORT))
-        client_socket.sendall(f"!lang {language}".encode())
-
+    if args.language is None:
+        args.language = args.voice[0]
 
-def send_voice(voice: str) -> None:
-    """Send new voice"""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-        client_socket.connect((HOST, PORT))
-        client_socket.sendall(f"!voice {voice}".encode())
+    error = check_language_voice(args.language, args.voice)
+    if error is not None:
+        message, display_choices = error
+        print(f"Error: {message}")
+        display_choices()
+        sys.exit(1)
 
 
 def parse_args() -> (
     Tuple[Action, Optional[float], Optional[str], Optional[str], bool, bool]
 ):
     """Parse command-line arguments"""
+    import argparse
+
     parser = argparse.ArgumentParser(
         description="Interact with kokorodoki daemon",
     )
 
-    global PORT
+    global PORT, USE_TCP
 
     parser.add_argument(
         "--clipboard",
@@ -209,6 +379,11 @@ def parse_args() -> (
     parser.add_argument(
         "--port", type=int, default=PORT, help=f"Choose a port number (default: {PORT})"
     )
+    parser.add_argument(
+        "--tcp",
+        action="store_true",
+        help="Connect over TCP instead of the local socket (implied by --port)",
+    )
     parser.add_argument(
         "--status",
         action="store_true",
@@ -234,13 +409,11 @@ def parse_args() -> (
     )
     parser.add_argument(
         "--list-languages",
-        "--list_languages",
         action="store_true",
         help="List available languages",
     )
     parser.add_argument(
         "--list-voices",
-        "--list_voices",
         type=str,
         nargs="?",
         const=None,
@@ -279,51 +452,56 @@ def parse_args() -> (
         help="Stop reading",
     )
 
-    args = parser.parse_args()
+    argv = normalize_long_options(sys.argv[1:])
+    args = parser.parse_args(argv)
 
     if args.list_languages:
+        from utils import display_languages
+
         display_languages()
         sys.exit(0)
 
     if args.list_voices is not False:
+        from utils import display_voices
+
         display_voices(args.list_voices)
         sys.exit(0)
 
-    languages = get_language_map()
-    voices = get_voices()
-
-    if args.language is None and args.voice is not None:
-        args.language = args.voice[0]
-    elif args.language is not None and args.language not in languages:
-        print(f"Error: Invalid language '{args.language}'")
-        display_languages()
-        sys.exit(1)
-
-    if args.voice is not None:
-        if args.voice not in voices:
-            print(f"Error: Invalid voice '{args.voice}'")
-            display_voices()
-            sys.exit(1)
-        if not args.voice.startswith(args.language):
-            print(
-                f"Error: Voice '{args.voice}' is not made for language '{get_language_map()[args.language]}'"
-            )
-            display_voices()
-            sys.exit(1)
+    if args.language is not None or args.voice is not None:
+        validate_language_voice(args)
 
     if args.speed is not None and not MIN_SPEED <= args.speed <= MAX_SPEED:
         print(f"Error: Speed must be between {MIN_SPEED} and {MAX_SPEED}")
         sys.exit(1)
 
     action = next(
-        (ACTION_MAPPING[flag] for flag in ACTION_MAPPING if getattr(args, flag, False)),
-        Action.NONE,
+        (action for flag, action in ACTION_ITEMS if getattr(args, flag)), Action.NONE
     )
 
+    USE_TCP = USE_TCP or args.tcp or args.port != PORT
     PORT = args.port
     return (action, args.speed, args.language, args.voice, args.status, args.clipboard)
 
 
+def parse_simple_args(
+    argv: List[str],
+) -> Optional[Tuple[Action, Optional[float], Optional[str], Optional[str], bool, bool]]:
+    """Handle bare clipboard, status and single action calls without argparse"""
+    if not argv:
+        return (Action.NONE, None, None, None, False, False)
+    if len(argv) != 1:
+        return None
+
+    flag = argv[0]
+    if flag in ("--clipboard", "-c"):
+        return (Action.NONE, None, None, None, False, True)
+    if flag == "--status":
+        return (Action.NONE, None, None, None, True, False)
+    if flag.startswith("--") and flag[2:] in ACTION_MAPPING:
+        return (ACTION_MAPPING[flag[2:]], None, None, None, False, False)
+    return None
+
+
 def send(
     action: Action,
     speed: Optional[float],
@@ -333,27 +511,37 @@ def send(
     clipboard: bool,
 ) -> None:
     "Send commands or clipboard."
-    if action in ACTION_COMMANDS:
-        send_action(ACTION_COMMANDS[action])
-        return
-
-    if speed is None and voice is None and language is None and not status:
-        send_text(clipboard)
-        return
+    messages = []
+    if language is not None or voice is not None:
+        from utils import get_language_map, get_voices
 
     if language is not None:
-        send_language(language)
+        lang_index = list(get_language_map()).index(language)
+        messages.append(struct.pack("<BB", OP_LANG, lang_index))
     if speed is not None:
-        send_speed(speed)
+        messages.append(struct.pack("<Bf", OP_SPEED, speed))
     if voice is not None:
-        send_voice(voice)
+        messages.append(struct.pack("<BH", OP_VOICE, get_voices().index(voice)))
+    if action in ACTION_COMMANDS:
+        messages.append(ACTION_COMMANDS[action])
     if status:
-        send_action("!status")
+        messages.append(STATUS_COMMAND)
+
+    if not messages:
+        send_text(clipboard)
+        return
+
+    with DaemonClient() as client:
+        for message in messages:
+            client.send(message)
 
 
 def main():
     """Main entry point."""
-    send(*parse_args())
+    args = parse_simple_args(sys.argv[1:])
+    if args is None:
+        args = parse_args()
+    send(*args)
 
 
 if __name__ == "__main__":
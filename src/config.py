@@ -1,4 +1,5 @@
-from rich.console import Console
+import os
+from typing import List
 
 SAMPLE_RATE = 24000  # Kokoro-82M sample rate
 MIN_SPEED = 0.5
@@ -11,8 +12,17 @@ HISTORY_FILE = ".kokorodoki_history"
 HISTORY_LIMIT = 1024
 PROMPT = "> "
 TIMEOUT = 5
+DEFAULT_LATENCY = "low"  # PortAudio output latency, "low", "high" or seconds
+PREFETCH_CHUNKS = 4  # Generated chunks allowed to wait for playback
+BACK_HISTORY = 100  # Played chunks kept for going back
+FILE_CHUNK_SIZE = 64 * 1024
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "kokorodoki"
+)
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # Synthesis cache size limit
+RECV_BUFFER_SIZE = 1024 * 1024  # Daemon receive buffer, grows for larger messages
 
-COMMANDS = [
+COMMANDS = (
     "!lang",
     "!voice",
     "!speed",
@@ -31,13 +41,64 @@ COMMANDS = [
     "!help",
     "!quit",
     "!ctrlc",
-    "!status",
-]
+)
 HOST = "0.0.0.0"
 PORT = 5561
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/tmp"), "kokorodoki.sock")
+
+# Binary daemon commands: a one byte opcode followed by a little-endian payload
+# for the commands that take an argument. Text messages always start with a
+# printable character, so both can be sent on the same socket.
+OP_STOP = 0x01
+OP_EXIT = 0x02
+OP_SPEED = 0x03  # f32 speed
+OP_LANG = 0x04  # u8 index into get_language_map()
+OP_VOICE = 0x05  # u16 index into get_voices()
+OP_PAUSE = 0x06
+OP_RESUME = 0x07
+OP_NEXT = 0x08
+OP_BACK = 0x09
+OP_STATUS = 0x0A
+OP_COMMANDS = {
+    OP_STOP: "!stop",
+    OP_EXIT: "!exit",
+    OP_SPEED: "!speed",
+    OP_LANG: "!lang",
+    OP_VOICE: "!voice",
+    OP_PAUSE: "!pause",
+    OP_RESUME: "!resume",
+    OP_NEXT: "!next",
+    OP_BACK: "!back",
+    OP_STATUS: "!status",
+}
+OP_PAYLOADS = {OP_SPEED: "<f", OP_LANG: "<B", OP_VOICE: "<H"}
+
 TITLE = "KokoroDoki"
 WINDOW_SIZE = "700x600"
 VERSION = "v0.1.0"
 DEFAULT_THEME = 1
+GUI_POLL_MS = 20  # Queue poll interval while the gui is busy
+GUI_IDLE_POLL_MS = 100  # Queue poll interval once it has been idle
+GUI_IDLE_POLLS = 25  # Empty polls before switching to the idle interval
+
+
+def normalize_long_options(argv: List[str]) -> List[str]:
+    """Accept the old underscore spellings of long options, e.g. --list_voices"""
+    normalized = []
+    for arg in argv:
+        if arg.startswith("--"):
+            # Only the option name, --list_voices=en_US keeps its value
+            name, sep, value = arg.partition("=")
+            arg = name.replace("_", "-") + sep + value
+        normalized.append(arg)
+    return normalized
+
+
+def __getattr__(name: str):
+    """Create the shared rich consoles on first use"""
+    if name in ("console", "error_console"):
+        from rich.console import Console
 
-console = Console()
+        value = globals()[name] = Console(stderr=name == "error_console")
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
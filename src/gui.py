@@ -3,15 +3,26 @@ import queue
 import signal
 import threading
 import tkinter as tk
+from bisect import bisect_left
+from functools import lru_cache
 from tkinter import messagebox
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 import easyocr
 import ttkbootstrap as ttk
 from kokoro import KPipeline
 from ttkbootstrap.tooltip import ToolTip
 
-from config import MAX_SPEED, MIN_SPEED, TITLE, VERSION, WINDOW_SIZE
+from config import (
+    GUI_IDLE_POLL_MS,
+    GUI_IDLE_POLLS,
+    GUI_POLL_MS,
+    MAX_SPEED,
+    MIN_SPEED,
+    TITLE,
+    VERSION,
+    WINDOW_SIZE,
+)
 from models import TTSPlayer
 from utils import (
     get_easyocr_language_map,
@@ -24,6 +35,13 @@ from utils import (
 )
 
 
+@lru_cache(maxsize=64)
+def darken_rgb(rgb: Tuple[int, int, int], factor: float) -> str:
+    """Darken a 16-bit per channel Tk color and return it as a hex string"""
+    red, green, blue = (int(c * factor / 65535 * 255) for c in rgb)
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
 class Gui:
     def __init__(
         self,
@@ -33,61 +51,97 @@ class Gui:
         voice: str,
         speed: float,
         device: Optional[str],
+        latency: str | float,
         image_reader: easyocr.Reader,
         dark_theme: bool,
     ):
         self.root = root
         self.dark_theme = dark_theme
-        self.languages = [lang for _, lang in get_language_map().items()]
+        language_map = get_language_map()
+        self.languages = list(language_map.values())
+        # Language name to code, for the names picked in the language menu
+        self.language_codes = {lang: code for code, lang in language_map.items()}
         self.voices = get_voices()
         self.current_language_code = language
-        self.current_language = get_language_map()[language]
+        self.current_language = language_map[language]
         self.current_voice = voice
         self.speed = speed
         self.device = device
         self.pipeline = pipeline
         self.player = TTSPlayer(
-            self.pipeline, self.current_language, self.current_voice, self.speed, False
+            self.pipeline,
+            self.current_language,
+            self.current_voice,
+            self.speed,
+            False,
+            latency=latency,
         )
         self.current_thread = None
         self.speech_paused = False
         self.prev_text = ""
         self.prev_sentences = []
+        self.prev_nltk_language = None  # Language prev_sentences were split for
         self.nltk_language = get_nltk_language(self.current_language_code)
         self.sentence_indices = []
 
         self.reader = image_reader
+        # Readers by easyocr language, loading one takes seconds
+        self.readers = {get_easyocr_language_map()[language]: image_reader}
 
         self.queue = queue.Queue()
-        self.root.after(100, self.process_queue)
+        self.poll_interval = GUI_POLL_MS
+        self.idle_polls = 0
+        self.root.after(self.poll_interval, self.process_queue)
 
         self.default_font = "Segoe UI"
         self.is_speaking = False
 
-        self._color_cache = {}
-
         self.create_widgets()
 
         self.default_bg = self.text_area.cget("background")
         self.default_fg = self.text_area.cget("foreground")
         self.default_cursor = self.text_area.cget("cursor")
+        # Text area options while it is being read and once it is editable again
+        self.locked_config = {
+            "state": "disabled",
+            "background": self.darken_color(self.default_bg),
+            "foreground": self.darken_color(self.default_fg),
+            "cursor": "arrow",
+        }
+        self.unlocked_config = {
+            "state": "normal",
+            "background": self.default_bg,
+            "foreground": self.default_fg,
+            "cursor": self.default_cursor,
+        }
         self.text_area.tag_config(
             "highlight", background="#3a86ff", foreground="#ffffff"
         )
 
     def process_queue(self) -> None:
+        calls = []
         try:
             while True:
                 item = self.queue.get_nowait()
-                if isinstance(item, tuple):
-                    func, args = item
-                    func(*args)
-                else:
-                    func = item
-                    func()
+                calls.append(item if isinstance(item, tuple) else (item, ()))
         except queue.Empty:
             pass
-        self.root.after(100, self.process_queue)
+
+        for i, (func, args) in enumerate(calls):
+            # Only the last of back to back calls to the same widget update shows
+            if i + 1 < len(calls) and calls[i + 1][0] == func:
+                continue
+            func(*args)
+
+        # Poll often while playback is feeding the queue, back off when idle
+        if calls:
+            self.poll_interval = GUI_POLL_MS
+            self.idle_polls = 0
+        else:
+            self.idle_polls += 1
+            if self.idle_polls > GUI_IDLE_POLLS:
+                self.poll_interval = GUI_IDLE_POLL_MS
+        self.root.after(self.poll_interval, self.process_queue)
 
     def change_speed(self, event) -> None:
         """Change speed"""
@@ -106,20 +160,14 @@ class Gui:
     def change_lang(self, event, voice_menu: ttk.Combobox) -> None:
         """Change language and update voice menu"""
         self.current_language = self.lang_var.get()
-        self.current_language_code = next(
-            code
-            for code, lang in get_language_map().items()
-            if lang == self.current_language
-        )
+        self.current_language_code = self.language_codes[self.current_language]
         self.player.change_language(self.current_language_code, self.device)
         self.status_label.config(text=f"Language set to: {self.current_language}")
 
-        easyocr_lang = [
-            lang
-            for code, lang in get_easyocr_language_map().items()
-            if code == self.current_language_code
-        ]
-        self.reader = easyocr.Reader(easyocr_lang)
+        easyocr_lang = get_easyocr_language_map()[self.current_language_code]
+        if easyocr_lang not in self.readers:
+            self.readers[easyocr_lang] = easyocr.Reader([easyocr_lang])
+        self.reader = self.readers[easyocr_lang]
 
         self.nltk_language = get_nltk_language(self.current_language_code)
 
@@ -135,16 +183,23 @@ class Gui:
 
     def play_speech(self) -> None:
         """Play or resume if it was paused"""
-        text = self.text_area.get("1.0", tk.END).strip()
+        content = self.text_area.get("1.0", "end-1c")
+        text = content.strip()
 
         if self.prev_text == text and self.speech_paused is True:
             self.speech_paused = False
             self.resume_speech()
         else:
-            self.text_area.delete("1.0", tk.END)
-            self.text_area.insert("1.0", text)
-            self.prev_text = text
-            self.prev_sentences = split_text_to_sentences(text, self.nltk_language)
+            # Only rewrite the widget when stripping changed what it shows
+            if content != text:
+                self.text_area.delete("1.0", tk.END)
+                self.text_area.insert("1.0", text)
+            # Playing the same text again reuses its sentences and indices
+            if text != self.prev_text or self.nltk_language != self.prev_nltk_language:
+                self.prev_text = text
+                self.prev_nltk_language = self.nltk_language
+                self.prev_sentences = split_text_to_sentences(text, self.nltk_language)
+                self.calculate_sentence_indices()
             if self.current_thread is not None and self.current_thread.is_alive():
                 self.player.stop_playback()
                 self.current_thread.join()
@@ -152,98 +207,63 @@ class Gui:
                 target=self.speak_thread, args=(self.prev_sentences,), daemon=True
             )
             self.current_thread.start()
-            self.calculate_sentence_indices()
             self.status_label.config(text="Playback: started")
 
     def speak_thread(self, text: str) -> None:
         """Player speak wrapper"""
         try:
-            self.queue.put(
-                lambda: self.text_area.config(
-                    state="disabled",
-                    background=self.darken_color(self.default_bg),
-                    foreground=self.darken_color(self.default_fg),
-                    cursor="arrow",
-                )
-            )
+            self.queue.put(self.lock_text_area)
             self.player.speak(text, console_mode=False, gui_highlight=self)
-            self.queue.put(
-                lambda: self.text_area.config(
-                    state="normal",
-                    background=self.default_bg,
-                    foreground=self.default_fg,
-                    cursor=self.default_cursor,
-                )
-            )
+            self.queue.put(self.unlock_text_area)
         except Exception as e:
             print(f"Error in thread: {str(e)}")
 
+    def lock_text_area(self) -> None:
+        """Make the text area read-only while it is being read"""
+        self.text_area.config(self.locked_config)
+
+    def unlock_text_area(self) -> None:
+        """Make the text area editable again"""
+        self.text_area.config(self.unlocked_config)
+
     def pause_speech(self) -> None:
         """Pause speech"""
         self.speech_paused = True
-        self.text_area.config(
-            state="normal",
-            background=self.default_bg,
-            foreground=self.default_fg,
-            cursor=self.default_cursor,
-        )
+        self.unlock_text_area()
         self.player.pause_playback()
         self.status_label.config(text="Playback: paused")
 
     def resume_speech(self) -> None:
         """Resume speech"""
-        self.text_area.config(
-            state="disabled",
-            background=self.darken_color(self.default_bg),
-            foreground=self.darken_color(self.default_fg),
-            cursor="arrow",
-        )
+        self.lock_text_area()
         self.player.resume_playback()
         self.status_label.config(text="Playback: resumed")
 
     def darken_color(self, color, factor=0.8) -> str:
         """Darken a color by a given factor"""
-        cache_key = (color, factor)
-        if cache_key in self._color_cache:
-            return self._color_cache[cache_key]
-        rgb = self.root.winfo_rgb(color)
-        darkened = tuple(int(c * factor / 65535 * 255) for c in rgb[:3])
-        result = f"#{darkened[0]:02x}{darkened[1]:02x}{darkened[2]:02x}"
-        self._color_cache[cache_key] = result
-        return result
+        return darken_rgb(self.root.winfo_rgb(color), factor)
 
     def calculate_sentence_indices(self) -> None:
         """Calculate start and end indices for each sentence."""
         self.sentence_indices.clear()
         current_pos = 0
         text_content = self.prev_text
+        newlines = [i for i, char in enumerate(text_content) if char == "\n"]
+
+        def text_index(pos: int) -> str:
+            """Convert a string offset to a Tk "line.column" index"""
+            line = bisect_left(newlines, pos)  # Newlines before pos
+            column = pos - newlines[line - 1] - 1 if line else pos
+            return f"{line + 1}.{column}"
 
         for sentence in self.prev_sentences:
             start_pos = text_content.find(sentence, current_pos)
             if start_pos == -1:
                 continue
 
-            # Calculate line and column for start index
-            text_before = text_content[:start_pos]
-            start_line = text_before.count("\n") + 1
-            start_char = (
-                start_pos - text_before.rfind("\n") - 1
-                if text_before.rfind("\n") != -1
-                else start_pos
-            )
-
-            # Calculate end position
             end_pos = start_pos + len(sentence)
-            text_before_end = text_content[:end_pos]
-            end_line = text_before_end.count("\n") + 1
-            end_char = (
-                end_pos - text_before_end.rfind("\n") - 1
-                if text_before_end.rfind("\n") != -1
-                else end_pos
-            )
-
             self.sentence_indices.append(
-                {"start": f"{start_line}.{start_char}", "end": f"{end_line}.{end_char}"}
+                {"start": text_index(start_pos), "end": text_index(end_pos)}
             )
             current_pos = end_pos
 
@@ -338,6 +358,7 @@ class Gui:
             )
             if file_path:
                 self.file_path_var.set(f"File: {file_path}")
+                self.placeholder_active = False  # Replaced by the file content
                 try:
                     image_extensions = [
                         ".png",
@@ -352,16 +373,13 @@ class Gui:
 
                     if file_ext in image_extensions:
                         self.text_area.delete(1.0, tk.END)
-                        results = self.reader.readtext(file_path)
-                        image_text = ""
-                        image_text = " ".join(
-                            text for _, text, _ in results if text
-                        ).strip()
-
-                        self.text_area.insert(
-                            tk.END,
-                            image_text,
-                        )
+                        self.status_label.config(text="OCR: reading image...")
+                        # OCR takes seconds, run it without freezing the window
+                        threading.Thread(
+                            target=self.read_image,
+                            args=(self.reader, file_path),
+                            daemon=True,
+                        ).start()
                     else:
                         with open(file_path, "r", encoding="utf-8") as file:
                             self.text_area.delete(1.0, tk.END)
@@ -372,6 +390,23 @@ class Gui:
         except Exception as e:
             print(f"An error occurred: {e}")
 
+    def read_image(self, reader: easyocr.Reader, file_path: str) -> None:
+        """Read the text in an image and pass it to the gui thread"""
+        try:
+            results = reader.readtext(file_path)
+            image_text = " ".join([text for _, text, _ in results if text]).strip()
+            status = "OCR: done"
+        except Exception as e:
+            image_text = f"Error reading file: {str(e)}"
+            status = "OCR: failed"
+        self.queue.put((self.show_image_text, (image_text, status)))
+
+    def show_image_text(self, image_text: str, status: str) -> None:
+        """Show the text read from an image"""
+        self.text_area.delete(1.0, tk.END)
+        self.text_area.insert(tk.END, image_text)
+        self.status_label.config(text=status)
+
     def add_text_area(self, container):
         """Create text area"""
         text_frame = ttk.LabelFrame(container, text="Text Content", padding=10)
@@ -425,20 +460,23 @@ class Gui:
         self.text_area.insert("1.0", placeholder)
         self.text_area.tag_add("placeholder", "1.0", "end")
         self.text_area.tag_config("placeholder", foreground="gray")
+        self.placeholder_active = True
 
         def clear_placeholder(event):
-            if self.text_area.tag_ranges("placeholder"):
+            if self.placeholder_active:
                 self.text_area.delete("1.0", "end")
                 self.text_area.tag_remove("placeholder", "1.0", "end")
+                self.placeholder_active = False
 
         def restore_placeholder(event):
-            if not self.text_area.get("1.0", "end-1c"):
+            # Checked when focus leaves, not after every key, to avoid copying the text
+            if not self.placeholder_active and not self.text_area.get("1.0", "end-1c"):
                 self.text_area.insert("1.0", placeholder)
                 self.text_area.tag_add("placeholder", "1.0", "end")
-                self.text_area.tag_config("placeholder", foreground="gray")
+                self.placeholder_active = True
 
         self.text_area.bind("<KeyPress>", clear_placeholder)
-        self.text_area.bind("<KeyRelease>", restore_placeholder)
+        self.text_area.bind("<FocusOut>", restore_placeholder)
         # self.text_area.bind("<FocusIn>", lambda e: clear_placeholder(e) if self.text_area.get("1.0", "end-1c") == placeholder else None)
 
     def add_control_panel(self, container):
@@ -628,6 +666,7 @@ def run_gui(
     voice: str,
     speed: float,
     device: Optional[str],
+    latency: str | float,
     theme: int,
     image_reader: easyocr.Reader,
 ) -> None:
@@ -643,7 +682,15 @@ def run_gui(
         # Check if it is a Dark or Light theme
         dark_theme = 1 <= theme <= 4
         app = Gui(
-            root, pipeline, language, voice, speed, device, image_reader, dark_theme
+            root,
+            pipeline,
+            language,
+            voice,
+            speed,
+            device,
+            latency,
+            image_reader,
+            dark_theme,
         )
 
         def on_closing():
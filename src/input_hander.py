@@ -1,10 +1,13 @@
-import argparse
+import socket
 import sys
 from dataclasses import dataclass
-from typing import Optional
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 
 from config import (
+    CACHE_DIR,
     DEFAULT_LANGUAGE,
+    DEFAULT_LATENCY,
     DEFAULT_SPEED,
     DEFAULT_THEME,
     DEFAULT_VOICE,
@@ -12,31 +15,43 @@ from config import (
     MIN_SPEED,
     PORT,
     console,
+    error_console,
+    normalize_long_options,
 )
 from utils import (
+    check_language_voice,
+    check_utf8,
     display_languages,
     display_themes,
     display_voices,
     get_gui_themes,
-    get_language_map,
-    get_voices,
     save_history,
 )
 
+if TYPE_CHECKING:
+    import argparse
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class Args:
     language: str
     voice: str
     speed: float
     history_off: bool
     device: Optional[str]
+    fp16: bool
+    quantize: bool
+    compile_model: bool
+    latency: str | float
+    cache: bool
     input_text: Optional[str]
+    input_file: Optional[str]
     output_file: Optional[str]
     all_voices: bool
     setup: bool
     daemon: bool
     port: int
+    tcp: bool
     gui: bool
     theme: int
     verbose: bool
@@ -44,8 +59,36 @@ class Args:
     is_srt_file: bool
 
 
-def parse_args() -> Args:
-    """Parse command-line arguments"""
+def print_error(message: str, label="Error") -> None:
+    """Print an error, skipping rich rendering when stderr is not a terminal"""
+    if sys.stderr.isatty():
+        error_console.print(f"[bold red]{label}:[/] {message}")
+    else:
+        print(f"{label}: {message}", file=sys.stderr)
+
+
+def parse_latency(value: str) -> str | float:
+    """Accept 'low', 'high' or a positive number of seconds"""
+    if value in ("low", "high"):
+        return value
+    try:
+        latency = float(value)
+    except ValueError:
+        latency = -1.0
+    if latency <= 0:
+        import argparse
+
+        raise argparse.ArgumentTypeError(
+            f"expected 'low', 'high' or seconds, got '{value}'"
+        )
+    return latency
+
+
+@lru_cache(maxsize=None)
+def build_parser() -> "argparse.ArgumentParser":
+    """Build the command-line parser"""
+    import argparse
+
     parser = argparse.ArgumentParser(
         prog="kokorodoki",
         description="Real-time TTS with Kokoro-82M.",
@@ -53,13 +96,11 @@ def parse_args() -> Args:
 
     parser.add_argument(
         "--list-languages",
-        "--list_languages",
         action="store_true",
         help="List available languages",
     )
     parser.add_argument(
         "--list-voices",
-        "--list_voices",
         type=str,
         nargs="?",
         const=None,
@@ -104,10 +145,36 @@ def parse_args() -> Args:
             "If 'cuda' is specified but unavailable, raises an error."
         ),
     )
+    parser.add_argument(
+        "--fp16",
+        action="store_true",
+        help="Run the model in half precision (cuda only)",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Quantize the model weights to int8 (cpu only)",
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        help="Compile the model with torch.compile (slower startup, faster generation)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=parse_latency,
+        default=DEFAULT_LATENCY,
+        help="Audio output latency: 'low', 'high' or seconds "
+        f"(default: '{DEFAULT_LATENCY}')",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"Cache synthesized sentences on disk in {CACHE_DIR}",
+    )
 
     parser.add_argument(
         "--history-off",
-        "--history_off",
         action="store_true",
         help="Disable the saving of history",
     )
@@ -118,7 +185,7 @@ def parse_args() -> Args:
         help="Print what is being done",
     )
     parser.add_argument(
-        "--ctrl_c_off",
+        "--ctrl-c-off",
         "-c",
         action="store_true",
         help="Make Ctrl+C not end playback",
@@ -164,6 +231,12 @@ def parse_args() -> Args:
     parser.add_argument(
         "--port", type=int, default=PORT, help=f"Choose a port number (default: {PORT})"
     )
+    parser.add_argument(
+        "--tcp",
+        action="store_true",
+        help="Listen on TCP instead of a local socket in daemon mode "
+        "(implied by --port)",
+    )
     parser.add_argument(
         "--gui",
         "-g",
@@ -177,7 +250,13 @@ def parse_args() -> Args:
         help=f"Choose a theme number (default: {get_gui_themes()[DEFAULT_THEME]}, use --themes to get list of themes)",
     )
 
-    args = parser.parse_args()
+    return parser
+
+
+def parse_args() -> Args:
+    """Parse command-line arguments"""
+    argv = normalize_long_options(sys.argv[1:])
+    args = build_parser().parse_args(argv)
 
     # Display lists if requested
     if args.list_languages:
@@ -197,9 +276,7 @@ def parse_args() -> Args:
         [args.gui, args.daemon, (args.text is not None or args.file is not None)]
     )
     if selected_mode not in (0, 1):
-        console.print(
-            "[bold red]Error:[/] Only one mode (Console, GUI, Daemon, or CLI) can be selected."
-        )
+        print_error("Only one mode (Console, GUI, Daemon, or CLI) can be selected.")
         sys.exit(0)
     if args.theme != DEFAULT_THEME and not args.gui:
         console.print(
@@ -209,71 +286,54 @@ def parse_args() -> Args:
         console.print(
             "[bold yellow]Warning:[/] Invalid use of verbose, ctrl_c_off, or history_off with mode other than Console."
         )
-    if args.port != PORT and not args.daemon:
-        console.print("[bold yellow]Warning:[/] Invalid use of --port without --daemon")
-
-    # Validate inputs
-    languages = get_language_map()
-    voices = get_voices()
-
-    if args.language not in languages:
-        console.print(f"[bold red]Error:[/] Invalid language '{args.language}'")
-        display_languages()
-        sys.exit(1)
-
-    if args.voice not in voices:
-        console.print(f"[bold red]Error:[/] Invalid voice '{args.voice}'")
-        display_voices()
-        sys.exit(1)
-    if not args.all and not args.voice.startswith(args.language):
+    if (args.port != PORT or args.tcp) and not args.daemon:
         console.print(
-            f"[bold red]Error:[/] Voice '{args.voice}' is not made for language '{get_language_map()[args.language]}'"
+            "[bold yellow]Warning:[/] Invalid use of --port or --tcp without --daemon"
         )
-        display_voices()
+
+    # Validate inputs
+    error = check_language_voice(args.language, args.voice, not args.all)
+    if error is not None:
+        message, display_choices = error
+        print_error(message)
+        display_choices()
         sys.exit(1)
 
     if not MIN_SPEED <= args.speed <= MAX_SPEED:
-        console.print(
-            f"[bold red]Error:[/] Speed must be between {MIN_SPEED} and {MAX_SPEED}"
-        )
+        print_error(f"Speed must be between {MIN_SPEED} and {MAX_SPEED}")
         sys.exit(1)
 
     if args.theme not in get_gui_themes():
-        console.print("[bold red]Error:[/] Invalid theme")
+        print_error("Invalid theme")
         display_themes()
         sys.exit(1)
 
     if not 0 <= args.port <= 65535:
-        console.print(
-            f"[bold red]Error:[/] Port {args.port} is out of valid range (0-65535)."
-        )
+        print_error(f"Port {args.port} is out of valid range (0-65535).")
         sys.exit(1)
 
     if args.output is not None and not args.output.endswith(".wav"):
-        console.print("[bold red]Error:[/] The output file name should end with .wav")
+        print_error("The output file name should end with .wav")
         sys.exit(1)
 
     # Validate that output or all isn't used without input
     if args.output is not None and args.all:
-        console.print("[bold red]Error:[/] --output/-o can't be used with --all")
+        print_error("--output/-o can't be used with --all")
         sys.exit(1)
     if args.output is not None and args.text is None and args.file is None:
-        console.print(
-            "[bold red]Error:[/] --output/-o can only be used with --text or --file"
-        )
+        print_error("--output/-o can only be used with --text or --file")
         sys.exit(1)
     if args.all and args.text is None and args.file is None:
-        console.print(
-            "[bold red]Error:[/] --all can only be used with --text or --file"
-        )
+        print_error("--all can only be used with --text or --file")
         sys.exit(1)
 
     # Handle input
     input_text = None
+    input_file = None
     is_srt_file = False
     if args.file is not None:
         if not args.file.strip():
-            console.print("[bold red]Error:[/] File path cannot be empty")
+            print_error("File path cannot be empty")
             sys.exit(1)
             
         # Check if it's an SRT file based on extension
@@ -281,26 +341,21 @@ def parse_args() -> Args:
         
         # Validate SRT files can't be used with --all
         if is_srt_file and args.all:
-            console.print("[bold red]Error:[/] --all cannot be used with SRT files")
+            print_error("--all cannot be used with SRT files")
             sys.exit(1)
         
         try:
-            # Validate file exists and is readable
-            with open(args.file, "r", encoding="utf-8") as f:
-                if is_srt_file:
-                    # Just validate SRT file is readable, don't load content
-                    f.read()
-                    input_text = args.file  # Store file path for SRT files
-                else:
-                    # Load content for text files
-                    input_text = f.read()
+            # Validate the file up front, content is streamed later and a
+            # decode error halfway through would leave a truncated output
+            check_utf8(args.file)
+            input_file = args.file
         except Exception as e:
             file_type = "SRT file" if is_srt_file else "file"
-            console.print(f"[bold red]Error reading {file_type}:[/] {e}")
+            print_error(str(e), f"Error reading {file_type}")
             sys.exit(1)
     elif args.text is not None:
         if not args.text.strip():
-            console.print("[bold red]Error:[/] Text cannot be empty")
+            print_error("Text cannot be empty")
             sys.exit(1)
         input_text = args.text
 
@@ -310,12 +365,19 @@ def parse_args() -> Args:
         args.speed,
         args.history_off,
         args.device,
+        args.fp16,
+        args.quantize,
+        args.compile,
+        args.latency,
+        args.cache,
         input_text,
+        input_file,
         args.output,
         args.all,
         args.setup,
         args.daemon,
         args.port,
+        args.tcp or args.port != PORT or not hasattr(socket, "AF_UNIX"),
         args.gui,
         args.theme,
         args.verbose,
@@ -326,5 +388,6 @@ def parse_args() -> Args:
 
 def get_input(history_off: bool, prompt="> ") -> str:
     user_input = input(prompt).strip()
-    save_history(history_off)
+    if not history_off:
+        save_history(user_input)
     return user_input
@@ -1,11 +1,42 @@
 import sys
+from typing import List
 
+from config import normalize_long_options
 from input_hander import Args, parse_args
-from utils import init_completer, init_history
+from utils import (
+    display_languages,
+    display_themes,
+    display_voices,
+    init_completer,
+    init_history,
+)
+
+
+def show_list(argv: List[str]) -> bool:
+    """Handle a lone listing option without building the argument parser"""
+    if not argv or len(argv) > 2:
+        return False
+    option = normalize_long_options(argv)[0]
+    if option == "--list-voices":
+        if len(argv) == 2 and argv[1].startswith("-"):
+            return False
+        display_voices(argv[1] if len(argv) == 2 else None)
+    elif len(argv) == 2:
+        return False
+    elif option == "--list-languages":
+        display_languages()
+    elif option == "--themes":
+        display_themes()
+    else:
+        return False
+    return True
 
 
 def main():
     """Main entry point."""
+    if show_list(sys.argv[1:]):
+        return
+
     args: Args = parse_args()
 
     init_completer()
@@ -1,25 +1,255 @@
+import copy
+import os
 import queue
 import sys
 import threading
-import time
-from typing import Optional
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import librosa
 import numpy as np
-import sounddevice as sd
-import soundfile as sf
-import torch
-from kokoro import KPipeline
-from rich.progress import (
-    BarColumn,
-    Progress,
-    SpinnerColumn,
-    TextColumn,
-    TimeElapsedColumn,
+
+import synth_cache
+from config import (
+    BACK_HISTORY,
+    DEFAULT_LATENCY,
+    MAX_SPEED,
+    MIN_SPEED,
+    PREFETCH_CHUNKS,
+    REPO_ID,
+    SAMPLE_RATE,
+    console,
+)
+from utils import (
+    get_language_map,
+    get_nltk_language,
+    get_voice_set,
+    get_voices_by_lang,
+    parse_srt_file,
+    split_text_to_sentences,
 )
 
-from config import MAX_SPEED, MIN_SPEED, REPO_ID, SAMPLE_RATE, console
-from utils import get_language_map, get_nltk_language, get_voices, parse_srt_file, split_text_to_sentences
+if TYPE_CHECKING:
+    from kokoro import KModel, KPipeline
+    from rich.progress import Progress
+
+
+def enable_fp16(model: "KModel") -> None:
+    """Run the model under CUDA fp16 autocast, keeping the vocoder in fp32"""
+    import torch
+
+    forward_with_tokens = model.forward_with_tokens
+    decode = model.decoder.forward
+
+    def fp16_forward_with_tokens(*args, **kwargs):
+        with torch.autocast("cuda", dtype=torch.float16):
+            return forward_with_tokens(*args, **kwargs)
+
+    def fp32_decode(*args):
+        # The iSTFT vocoder doesn't support half precision
+        with torch.autocast("cuda", enabled=False):
+            return decode(*(arg.float() for arg in args))
+
+    model.forward_with_tokens = fp16_forward_with_tokens
+    model.decoder.forward = fp32_decode
+
+
+def load_pipeline(
+    language: str,
+    device: Optional[str],
+    fp16=False,
+    quantize=False,
+    compile_model=False,
+) -> "KPipeline":
+    """Create the Kokoro pipeline"""
+    import torch
+    from kokoro import KModel
+
+    # Same device choice KPipeline makes when it loads the model itself
+    if device == "cuda" and not torch.cuda.is_available():
+        raise RuntimeError("CUDA requested but not available")
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = KModel(repo_id=REPO_ID).to(device).eval()
+    quantized = False
+    if quantize:
+        if model.device.type == "cpu":
+            # int8 weights for the Linear layers, swapped in place. The LSTMs
+            # stay in float: kokoro calls flatten_parameters() on them every
+            # forward, which the dynamic quantized LSTM doesn't have
+            torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+            quantized = True
+        else:
+            console.print("[bold yellow]Warning:[/] --quantize only applies to cpu")
+    # Generation runs in worker threads, where a global no_grad wouldn't apply
+    model.forward = torch.inference_mode()(model.forward)
+    if fp16:
+        if model.device.type == "cuda":
+            enable_fp16(model)
+        else:
+            console.print("[bold yellow]Warning:[/] --fp16 only applies to cuda")
+    if compile_model:
+        # Phoneme lengths vary from chunk to chunk
+        model.forward_with_tokens = torch.compile(
+            model.forward_with_tokens, dynamic=True
+        )
+    # Through the cache, so switching back to this language reuses the pipeline
+    pipeline = get_pipeline(language, model)
+    if compile_model or quantized:
+        # Run the modified model once now, compilation is paid here rather
+        # than on the first sentence and a broken model fails at startup
+        for _ in pipeline("Hello.", voice=get_voices_by_lang()[language][0]):
+            pass
+    return pipeline
+
+
+def trim_audio(
+    audio: np.ndarray, top_db=60, frame_length=2048, hop_length=512, amin=1e-5
+) -> np.ndarray:
+    """Trim leading and trailing silence, same result as librosa.effects.trim"""
+    size = len(audio)
+    # Mean power of each centered frame, read off a running sum built in
+    # place in a single buffer
+    power_sum = np.empty(size + 1)
+    power_sum[0] = 0.0
+    np.square(audio, out=power_sum[1:])
+    np.cumsum(power_sum[1:], out=power_sum[1:])
+    centers = np.arange(0, size + 1, hop_length)
+    half = frame_length // 2
+    lo = np.clip(centers - half, 0, size)
+    hi = np.clip(centers + half, 0, size)
+    power = (power_sum[hi] - power_sum[lo]) / frame_length
+    # Floored like librosa's amplitude_to_db, quiet frames all count as amin
+    np.maximum(power, amin**2, out=power)
+
+    # Keep the frames within top_db of the loudest one
+    threshold = power.max() * 10.0 ** (-top_db / 10)
+    non_silent = np.flatnonzero(power > threshold)
+    if non_silent.size == 0:
+        return audio[:0]
+
+    start = non_silent[0] * hop_length
+    end = min(size, (non_silent[-1] + 1) * hop_length)
+    return audio[start:end]
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """Convert float samples in [-1, 1] to 16-bit PCM"""
+    scaled = np.multiply(audio, 32767.0, dtype=np.float32)
+    np.clip(scaled, -32768.0, 32767.0, out=scaled)
+    return scaled.astype(np.int16)
+
+
+def load_pipeline_async(*args) -> "Future[KPipeline]":
+    """Run load_pipeline in a background thread"""
+    future: Future = Future()
+
+    def load() -> None:
+        try:
+            future.set_result(load_pipeline(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    threading.Thread(target=load, daemon=True).start()
+    return future
+
+
+def file_progress() -> "Progress":
+    """Progress display for writing audio files, disabled when not on a terminal"""
+    from rich.progress import (
+        BarColumn,
+        Progress,
+        SpinnerColumn,
+        TextColumn,
+        TimeElapsedColumn,
+    )
+
+    return Progress(
+        SpinnerColumn("dots", style="yellow", speed=0.8),
+        TextColumn("[bold yellow]{task.description}"),
+        BarColumn(pulse_style="yellow", complete_style="blue"),
+        TimeElapsedColumn(),
+        # No live redraw thread when the output isn't shown anyway
+        disable=not console.is_terminal,
+    )
+
+
+def drain_queue(q: queue.Queue) -> None:
+    """Discard the items waiting in a queue"""
+    try:
+        while True:
+            q.get_nowait()
+            q.task_done()
+    except queue.Empty:
+        pass
+
+
+@lru_cache(maxsize=4)
+def get_pipeline(language: str, model: "KModel") -> "KPipeline":
+    """Return a pipeline for a language, built around an already loaded model"""
+    from kokoro import KPipeline
+
+    return KPipeline(lang_code=language, repo_id=REPO_ID, model=model)
+
+
+@lru_cache(maxsize=4)
+def get_phonemizer(pipeline: "KPipeline") -> "KPipeline":
+    """Return a model-less view of a pipeline that only runs its G2P"""
+    phonemizer = copy.copy(pipeline)
+    phonemizer.model = None
+    return phonemizer
+
+
+def keep_voice_on_device(pipeline: "KPipeline", voice: str) -> None:
+    """Cache the voice pack on the model's device, it is moved there every call"""
+    pack = pipeline.load_voice(voice)
+    if pack.device != pipeline.model.device:
+        pipeline.voices[voice] = pack.to(pipeline.model.device)
+
+
+def prefetch(items: Iterable, size: int) -> Iterator:
+    """Iterate in a background thread, keeping up to size items ready"""
+    ready: queue.Queue = queue.Queue(maxsize=size)
+    closed = threading.Event()
+    done = object()
+
+    def put(entry) -> bool:
+        while not closed.is_set():
+            try:
+                ready.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = ready.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # Let the producer go when the consumer stops early, and wait for the
+        # item it is on so nothing outlives the run
+        closed.set()
+        producer.join()
 
 
 class TTSPlayer:
@@ -27,12 +257,13 @@ class TTSPlayer:
 
     def __init__(
         self,
-        pipeline: KPipeline,
+        pipeline: "KPipeline | Future[KPipeline]",
         language: str,
         voice: str,
         speed: float,
         verbose: bool,
         ctrlc: bool = True,
+        latency: str | float = DEFAULT_LATENCY,
     ):
         self.pipeline = pipeline
         self.language = language
@@ -41,8 +272,8 @@ class TTSPlayer:
         self.speed = speed
         self.verbose = verbose
         self.languages = get_language_map()
-        self.voices = get_voices()
-        self.audio_queue = queue.Queue()
+        self.voices = get_voice_set()
+        self.audio_queue = queue.Queue(maxsize=PREFETCH_CHUNKS)
         self.stop_event = threading.Event()
         self.skip = threading.Event()
         self.back = threading.Event()
@@ -50,19 +281,39 @@ class TTSPlayer:
         self.back_number = 0
         self.audio_player = None
         self.ctrlc = not ctrlc
+        self.latency = latency
         self.print_complete = True
+        # Phonemes by sentence, set to a dict to reuse G2P across speak() calls
+        self.phoneme_memo: Optional[Dict[str, List[Tuple[str, str]]]] = None
+        # Generation and playback threads of the last speak() call
+        self.run_threads: Tuple[threading.Thread, ...] = ()
+
+    @property
+    def pipeline(self) -> "KPipeline":
+        """The pipeline, waited for if it is still loading in the background"""
+        self.wait_for_pipeline()
+        return self._pipeline
+
+    @pipeline.setter
+    def pipeline(self, pipeline: "KPipeline | Future[KPipeline]") -> None:
+        self._pipeline = pipeline
+
+    def pipeline_ready(self) -> bool:
+        return not isinstance(self._pipeline, Future)
+
+    def wait_for_pipeline(self) -> None:
+        """Block until a background load finishes, raising its error if it failed"""
+        if isinstance(self._pipeline, Future):
+            self._pipeline = self._pipeline.result()
 
     def change_language(self, new_lang: str, device: Optional[str]) -> bool:
         """Change the language and reinitialize the pipeline."""
         if new_lang in self.languages:
             self.language = new_lang
-            self.pipeline = KPipeline(
-                lang_code=self.language, repo_id=REPO_ID, device=device
-            )
+            # Only the G2P is language specific, keep the loaded model
+            self.pipeline = get_pipeline(new_lang, self.pipeline.model)
             if not self.voice.startswith(new_lang):
-                self.change_voice(
-                    next(voice for voice in get_voices() if voice.startswith(new_lang))
-                )
+                self.change_voice(get_voices_by_lang()[new_lang][0])
             self.nltk_language = get_nltk_language(self.language)
             return True
         return False
@@ -81,60 +332,108 @@ class TTSPlayer:
             return True
         return False
 
-    def trim_silence(self, audio, threshold=0.003):
-        """Trim silence from the beginning and end of an audio chunk."""
-        # Convert to absolute values to handle negative amplitudes
-        abs_audio = np.abs(audio)
-        # Find indices where amplitude exceeds threshold
-        non_silent = np.where(abs_audio > threshold)[0]
-
-        if len(non_silent) == 0:
-            return audio
+    def put_audio(self, audio: Optional[np.ndarray]) -> None:
+        """Queue a chunk, waiting for room unless playback has been stopped"""
+        while not self.stop_event.is_set():
+            try:
+                self.audio_queue.put(audio, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        try:
+            self.audio_queue.put_nowait(audio)
+        except queue.Full:
+            pass  # The player isn't blocked on an empty queue
 
-        # Trim the audio
-        start_idx = non_silent[0]
-        end_idx = non_silent[-1] + 1
-        return audio[start_idx:end_idx]
+    def prepare_sentences(
+        self,
+        sentences: Iterable[str],
+        pipeline: "KPipeline",
+        language: str,
+        voice: str,
+        speed: float,
+    ) -> Iterator[Tuple[str, Optional[np.ndarray], List[Tuple[str, str]]]]:
+        """Yield each sentence with its cached audio, or its phoneme chunks"""
+        phonemizer = get_phonemizer(pipeline)
+        for sentence in sentences:
+            audio = synth_cache.get(sentence, voice, language, speed)
+            if audio is not None:
+                yield sentence, audio, []
+            else:
+                memo = self.phoneme_memo
+                chunks = memo.get(sentence) if memo is not None else None
+                if chunks is None:
+                    chunks = [
+                        (result.graphemes, result.phonemes)
+                        for result in phonemizer(sentence, split_pattern=None)
+                    ]
+                    if memo is not None:
+                        memo[sentence] = chunks
+                yield sentence, None, chunks
 
-    def generate_audio(self, text: str | list) -> None:
+    def generate_audio(self, text: str | Iterable[str]) -> None:
         """Generate audio chunks and put them in the queue."""
         try:
             sentences = [text] if isinstance(text, str) else text
-            for sentence in sentences:
-                generator = self.pipeline(
-                    sentence, voice=self.voice, speed=self.speed, split_pattern=None
-                )
-
-                for result in generator:
+            # Settings changed mid-run apply to the next run, so the cache keys
+            # and the synthesis always agree
+            pipeline, language = self.pipeline, self.language
+            voice, speed = self.voice, self.speed
+            keep_voice_on_device(pipeline, voice)
+            # The next sentences go through the cache and G2P while the model runs
+            for sentence, cached_audio, chunks in prefetch(
+                self.prepare_sentences(sentences, pipeline, language, voice, speed),
+                PREFETCH_CHUNKS,
+            ):
+                if cached_audio is not None:
                     if self.stop_event.is_set():
-                        self.audio_queue.put(None)
+                        self.put_audio(None)
                         return
+                    self.put_audio(cached_audio)
+                    continue
+
+                generated = []
+                for graphemes, phonemes in chunks:
+                    generator = pipeline.generate_from_tokens(
+                        phonemes, voice=voice, speed=speed
+                    )
+
+                    for result in generator:
+                        if self.stop_event.is_set():
+                            self.put_audio(None)
+                            return
+
+                        if result.audio is not None:
+                            audio = result.audio.numpy()
+                            if self.verbose:
+                                console.print(
+                                    f"[dim]Generated: {graphemes[:30]}...[/]"
+                                )
+                            # Trim silence for smooth reading
+                            trimed_audio = trim_audio(audio, top_db=60)
+                            # Queued and played as 16-bit PCM, half the size of float32
+                            pcm = to_pcm16(trimed_audio)
+                            generated.append(pcm)
+                            self.put_audio(pcm)
+
+                synth_cache.put(sentence, voice, language, speed, generated)
 
-                    if result.audio is not None:
-                        audio = result.audio.numpy()
-                        if self.verbose:
-                            console.print(
-                                f"[dim]Generated: {result.graphemes[:30]}...[/]"
-                            )
-                        # Trim silence for smooth reading
-                        trimed_audio, _ = librosa.effects.trim(audio, top_db=60)
-                        # trimed_audio = self.trim_silence(audio, threshold=0.001)
-                        self.audio_queue.put(trimed_audio)
-
-            self.audio_queue.put(None)  # Signal end of generation
+            self.put_audio(None)  # Signal end of generation
         except Exception as e:
             console.print(f"[bold red]Generation error:[/] {str(e)}")
-            self.audio_queue.put(None)  # Ensure playback thread exits
+            self.put_audio(None)  # Ensure playback thread exits
 
-    def generate_audio_file(self, text: list | str, output_file="Output.wav") -> None:
+    def generate_audio_file(
+        self, text: Iterable[str] | str, output_file="Output.wav"
+    ) -> None:
         """Generate audio file"""
+        import soundfile as sf
+
+        # Written aside and moved into place once complete, so an interrupted
+        # or failed run doesn't leave a truncated file at output_file
+        partial_file = f"{output_file}.part"
         try:
-            with Progress(
-                SpinnerColumn("dots", style="yellow", speed=0.8),
-                TextColumn("[bold yellow]{task.description}"),
-                BarColumn(pulse_style="yellow", complete_style="blue"),
-                TimeElapsedColumn(),
-            ) as progress:
+            with file_progress() as progress:
 
                 task = progress.add_task(
                     f"[bold yellow]Generating {output_file}",
@@ -142,20 +441,22 @@ class TTSPlayer:
                 )
 
                 sentences = [text] if isinstance(text, str) else text
-                audio_chunks = []
-                for sentence in sentences:
-                    generator = self.pipeline(
-                        sentence, voice=self.voice, speed=self.speed, split_pattern=None
-                    )
-
-                    for result in generator:
-                        trimed_audio, _ = librosa.effects.trim(
-                            result.audio.numpy(), top_db=70
+                # Write chunks as they are generated instead of joining them first
+                with sf.SoundFile(
+                    partial_file, "w", SAMPLE_RATE, 2, format="WAV"
+                ) as output:
+                    for sentence in sentences:
+                        generator = self.pipeline(
+                            sentence,
+                            voice=self.voice,
+                            speed=self.speed,
+                            split_pattern=None,
                         )
-                        audio_chunks.append(self.to_stereo(trimed_audio))
 
-                full_audio = np.concatenate(audio_chunks, axis=0)
-                sf.write(output_file, full_audio, SAMPLE_RATE, format="WAV")
+                        for result in generator:
+                            trimed_audio = trim_audio(result.audio.numpy(), top_db=70)
+                            output.write(self.to_stereo(trimed_audio))
+                os.replace(partial_file, output_file)
 
                 progress.update(
                     task,
@@ -163,15 +464,24 @@ class TTSPlayer:
                     total=1,
                     description=f"[bold green]Saved to {output_file}[/]",
                 )
+            if progress.disable:
+                console.print(f"Saved to {output_file}")
 
         except KeyboardInterrupt:
             console.print("\n[bold yellow]Exiting...[/]")
             sys.exit()
         except Exception as e:
             console.print(f"[bold red]Generation error:[/] {str(e)}")
+        finally:
+            try:
+                os.unlink(partial_file)
+            except FileNotFoundError:
+                pass  # Moved into place
 
     def generate_srt_timed_audio(self, srt_file: str, output_file="Output.wav") -> None:
         """Generate timed audio based on SRT subtitle file"""
+        import soundfile as sf
+
         try:
             # Parse SRT file
             srt_entries = parse_srt_file(srt_file)
@@ -179,12 +489,7 @@ class TTSPlayer:
                 console.print("[bold red]Error:[/] No valid entries found in SRT file")
                 return
 
-            with Progress(
-                SpinnerColumn("dots", style="yellow", speed=0.8),
-                TextColumn("[bold yellow]{task.description}"),
-                BarColumn(pulse_style="yellow", complete_style="blue"),
-                TimeElapsedColumn(),
-            ) as progress:
+            with file_progress() as progress:
 
                 task = progress.add_task(
                     f"[bold yellow]Generating timed audio from SRT",
@@ -211,7 +516,7 @@ class TTSPlayer:
 
                         for result in generator:
                             if result.audio is not None:
-                                trimmed_audio, _ = librosa.effects.trim(
+                                trimmed_audio = trim_audio(
                                     result.audio.numpy(), top_db=70
                                 )
                                 entry_audio_chunks.append(self.to_stereo(trimmed_audio))
@@ -272,9 +577,9 @@ class TTSPlayer:
     def play_audio(self, gui_highlight=None) -> None:
         """Play audio chunks from the queue."""
         try:
-            if self.audio_player is None:
-                self.audio_player = AudioPlayer(SAMPLE_RATE)
-            audio_chunks = []
+            self.ensure_audio_player()
+            # Only the most recent chunks are kept for going back
+            audio_chunks = deque(maxlen=BACK_HISTORY)
             audio_size = 0
             self.back_number = 0
             self.print_complete = True
@@ -282,11 +587,14 @@ class TTSPlayer:
                 self.skip.clear()
                 self.back.clear()
                 with self.lock:
-                    back_number = self.back_number = min(self.back_number, audio_size)
-                if back_number > 0 and audio_size > 0:
-                    audio = audio_chunks[audio_size - back_number]
+                    back_number = self.back_number = min(
+                        self.back_number, len(audio_chunks)
+                    )
+                if back_number > 0:
+                    audio = audio_chunks[-back_number]
                 else:
                     audio = self.audio_queue.get()
+                    self.audio_queue.task_done()
                     if audio is None:
                         break
 
@@ -301,23 +609,19 @@ class TTSPlayer:
                     gui_highlight.queue.put(
                         (gui_highlight.highlight, (audio_size - (back_number or 1),))
                     )
-                while self.audio_player.is_playing:
-                    if self.stop_event.is_set():
-                        self.audio_player.stop()
-                        return
-                    elif self.skip.is_set():
-                        self.audio_player.stop()
-                        break
-                    elif self.back.is_set():
-                        self.audio_player.stop()
-                        break
-                    time.sleep(0.2)
+                # The event is set when the chunk ends, and by skip, back and
+                # stop once their flag is raised, so checking first is enough
+                if not self.interrupted():
+                    self.audio_player.event.wait()
+                if self.stop_event.is_set():
+                    self.audio_player.stop()
+                    return
+                elif self.skip.is_set() or self.back.is_set():
+                    self.audio_player.stop()
 
                 with self.lock:
                     if not self.back.is_set() and self.back_number > 0:
                         self.back_number -= 1
-                    if self.back_number == 0:
-                        self.audio_queue.task_done()
             if gui_highlight is not None:
                 gui_highlight.queue.put(gui_highlight.remove_highlight)
             self.audio_player.stop()
@@ -325,40 +629,76 @@ class TTSPlayer:
                 console.print("[green]Playback complete.[/]\n")
         except Exception as e:
             console.print(f"[dim]Playback thread error: {e}[/dim]")
+            # Nothing reads the queue anymore, release the generator waiting on it
+            self.stop_event.set()
+
+    def interrupted(self) -> bool:
+        """Whether a stop, skip or back is waiting to be handled"""
+        return self.stop_event.is_set() or self.skip.is_set() or self.back.is_set()
+
+    def wake_player(self) -> None:
+        """Wake play_audio from the chunk it is waiting on"""
+        if self.audio_player is not None:
+            self.audio_player.event.set()
 
     def skip_sentence(self) -> None:
         self.skip.set()
+        self.wake_player()
 
     def back_sentence(self) -> None:
         self.back_number += 1
         self.back.set()
+        self.wake_player()
 
     def stop_playback(self, printm=True) -> None:
         """Stop ongoing generation and playback."""
         self.stop_event.set()
+        self.wake_player()
 
-        with self.audio_queue.mutex:
-            self.audio_queue.queue.clear()
+        drain_queue(self.audio_queue)
+        # Unblock a player waiting for a chunk that won't be generated now
+        try:
+            self.audio_queue.put_nowait(None)
+        except queue.Full:
+            pass
 
         if printm:
             console.print("\n[yellow]Playback stopped.[/]\n")
 
+    def ensure_audio_player(self) -> "AudioPlayer":
+        """Open the output stream on first use, it is reused for every chunk"""
+        if self.audio_player is None:
+            self.audio_player = AudioPlayer(SAMPLE_RATE, self.latency)
+        return self.audio_player
+
     def pause_playback(self) -> None:
         """Pause playback."""
-        self.audio_player.pause()
+        if self.audio_player is not None:
+            self.audio_player.pause()
 
     def resume_playback(self) -> None:
         """Resume playback."""
-        self.audio_player.resume()
+        if self.audio_player is not None:
+            self.audio_player.resume()
 
-    def speak(self, text: str | list, console_mode=True, gui_highlight=None) -> None:
+    def speak(
+        self,
+        text: str | Iterable[str],
+        console_mode=True,
+        gui_highlight=None,
+    ) -> None:
         """Start TTS generation and playback in separate threads."""
 
+        if any(thread.is_alive() for thread in self.run_threads):
+            # A run left going shares the queue and the G2P, stop it first
+            self.stop_playback(False)
+            for thread in self.run_threads:
+                thread.join()
+
         self.stop_event.clear()
 
         # Make sure the queue is empty
-        with self.audio_queue.mutex:
-            self.audio_queue.queue.clear()
+        drain_queue(self.audio_queue)
 
         gen_thread = threading.Thread(
             target=self.generate_audio, args=(text,), daemon=True
@@ -366,6 +706,7 @@ class TTSPlayer:
         play_thread = threading.Thread(
             target=self.play_audio, args=(gui_highlight,), daemon=True
         )
+        self.run_threads = (gen_thread, play_thread)
 
         try:
             # Start generation thread
@@ -395,88 +736,95 @@ class TTSPlayer:
                 sys.exit()
 
 
+@dataclass
+class PlaybackState:
+    """A clip handed to the audio callback, and the callback's position in it"""
+
+    audio: np.ndarray
+    mono: bool
+    frame: int = 0
+    done: threading.Event = field(default_factory=threading.Event)
+
+
 class AudioPlayer:
-    def __init__(self, samplerate):
+    def __init__(self, samplerate, latency: str | float = DEFAULT_LATENCY):
         self.samplerate = samplerate
-        self.current_frame = 0
         self.playing = True
+        # Swapped whole by play() and stop(), so the callback never takes a lock
+        self.state: Optional[PlaybackState] = None
         self.event = threading.Event()
-        self.lock = threading.Lock()
-        self.current_audio = None
+        import sounddevice as sd
+
         self.stream = sd.OutputStream(
             samplerate=self.samplerate,
             channels=2,
+            dtype="int16",
+            latency=latency,
             callback=self._callback,
             finished_callback=self._finished_callback,
         )
         self.stream.start()
 
     def _callback(self, outdata, frames, time, status):
-        with self.lock:
-            if not self.playing or self.current_audio is None:
-                outdata.fill(0)
-                return
-
-            chunksize = min(len(self.current_audio) - self.current_frame, frames)
-
-            if len(self.current_audio.shape) == 1:
-                # Mono audio: copy to all output channels
-                for channel in range(outdata.shape[1]):
-                    outdata[:chunksize, channel] = self.current_audio[
-                        self.current_frame : self.current_frame + chunksize
-                    ]
-            else:
-                # Stereo or multi-channel: copy up to available channels
-                channels = min(self.current_audio.shape[1], outdata.shape[1])
-                outdata[:chunksize, :channels] = self.current_audio[
-                    self.current_frame : self.current_frame + chunksize, :channels
-                ]
-
-            if chunksize < frames:
-                outdata[chunksize:] = 0
-                self.current_audio = None
-                self.event.set()
-
-            self.current_frame += chunksize
+        state = self.state
+        if not self.playing or state is None:
+            outdata.fill(0)
+            return
+
+        audio = state.audio
+        start = state.frame
+        chunksize = min(len(audio) - start, frames)
+
+        if state.mono:
+            # Mono audio: broadcast the column to all output channels at once
+            np.copyto(outdata[:chunksize], audio[start : start + chunksize, None])
+        else:
+            # Stereo or multi-channel: copy up to available channels
+            channels = min(audio.shape[1], outdata.shape[1])
+            outdata[:chunksize, :channels] = audio[start : start + chunksize, :channels]
+
+        state.frame = start + chunksize
+        if chunksize < frames:
+            outdata[chunksize:] = 0
+            state.done.set()
 
     def _finished_callback(self):
         """Called when stream is stopped"""
-        self.event.set()
+        state = self.state
+        if state is not None:
+            state.done.set()
 
     def play(self, audio, blocking=False) -> None:
         """Start playback of a single audio clip"""
-        with self.lock:
-            self.current_audio = audio
-            self.current_frame = 0
-            self.playing = True
+        state = PlaybackState(audio, audio.ndim == 1)
+        self.event = state.done
+        self.playing = True
+        self.state = state
 
         if blocking:
-            self.event.clear()
-            self.event.wait()
+            state.done.wait()
 
     def resume(self) -> None:
         """Resume playback"""
-        with self.lock:
-            self.playing = True
+        self.playing = True
 
     def pause(self) -> None:
         """Pause playback"""
-        with self.lock:
-            self.playing = False
+        self.playing = False
 
     def stop(self) -> None:
         """Stop playback and clear current audio"""
-        with self.lock:
-            self.playing = False
-            self.current_frame = 0
-            self.current_audio = None
-            self.event.set()
+        state = self.state
+        self.playing = False
+        self.state = None
+        if state is not None:
+            state.done.set()
 
     @property
     def is_playing(self) -> bool:
         """Check if audio is actively playing"""
-        with self.lock:
-            return self.current_audio is not None
+        state = self.state
+        return state is not None and not state.done.is_set()
 
     def __del__(self):
         """Cleanup when object is destroyed"""
@@ -1,9 +1,13 @@
+import errno
+import os
 import socket
+import struct
 import sys
 import threading
 import time
 import warnings
-from typing import Optional
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 from config import (
     DEFAULT_LANGUAGE,
@@ -13,10 +17,16 @@ from config import (
     MAX_SPEED,
     TIMEOUT,
     MIN_SPEED,
+    OP_COMMANDS,
+    OP_LANG,
+    OP_PAYLOADS,
+    OP_SPEED,
+    OP_VOICE,
     PORT,
     PROMPT,
-    REPO_ID,
+    RECV_BUFFER_SIZE,
     SAMPLE_RATE,
+    SOCKET_PATH,
     console,
 )
 
@@ -45,11 +55,11 @@ with console.status(
     from kokoro import KPipeline
 console.print("[bold green]Kokoro initialized!")
 
-import easyocr
 import nltk
 
+import synth_cache
 from input_hander import Args, get_input
-from models import TTSPlayer
+from models import TTSPlayer, load_pipeline, load_pipeline_async
 from utils import (
     clear_history,
     display_help,
@@ -60,25 +70,43 @@ from utils import (
     get_easyocr_language_map,
     get_language_map,
     get_voices,
+    get_voices_by_lang,
+    iter_file_sentences,
+    merge_short_sentences,
     split_text_to_sentences,
 )
 
+if TYPE_CHECKING:
+    import easyocr
+
 running_threads = 1
 
 def start(args: Args) -> None:
     """Initialize and run"""
     try:
-        with console.status(
-            "[yellow]Initializing Kokoro pipeline...[/]",
-            spinner="dots",
-            spinner_style="yellow",
-            speed=0.8,
-        ):
-            # Initialize TTS pipeline
-            pipeline = KPipeline(
-                lang_code=args.language, repo_id=REPO_ID, device=args.device
-            )
-        console.print("[bold green]Kokoro pipeline initialized!")
+        pipeline_args = (
+            args.language,
+            args.device,
+            args.fp16,
+            args.quantize,
+            args.compile_model,
+        )
+        console_mode = not (
+            args.setup or args.daemon or args.gui or args.input_text or args.input_file
+        )
+        if console_mode:
+            # Loaded while the prompt comes up, the first sentence waits for it
+            pipeline = load_pipeline_async(*pipeline_args)
+        else:
+            with console.status(
+                "[yellow]Initializing Kokoro pipeline...[/]",
+                spinner="dots",
+                spinner_style="yellow",
+                speed=0.8,
+            ):
+                # Initialize TTS pipeline
+                pipeline = load_pipeline(*pipeline_args)
+            console.print("[bold green]Kokoro pipeline initialized!")
 
         # Download nltk tokenizers if not found
         try:
@@ -97,16 +125,13 @@ def start(args: Args) -> None:
 
         # audio_warmup()
 
+        if args.cache:
+            synth_cache.enable()
+
         if args.setup:
             return
         elif args.daemon:
-            easyocr_lang = [
-                lang
-                for code, lang in get_easyocr_language_map().items()
-                if code == args.language
-            ]
-
-            image_reader = easyocr.Reader(easyocr_lang)
+            image_reader = load_image_reader(args.language)
             run_daemon(
                 pipeline,
                 args.language,
@@ -114,50 +139,56 @@ def start(args: Args) -> None:
                 args.speed,
                 args.device,
                 args.verbose,
+                args.latency,
                 args.port,
+                args.tcp,
                 image_reader,
             )
         elif args.gui:
             from gui import run_gui
 
-            easyocr_lang = [
-                lang
-                for code, lang in get_easyocr_language_map().items()
-                if code == args.language
-            ]
-
-            image_reader = easyocr.Reader(easyocr_lang)
+            image_reader = load_image_reader(args.language)
             run_gui(
                 pipeline,
                 args.language,
                 args.voice,
                 args.speed,
                 args.device,
+                args.latency,
                 args.theme,
                 image_reader,
             )
-        elif args.all_voices and args.input_text:
+        elif args.all_voices and (args.input_text or args.input_file):
             run_with_all(
-                pipeline, args.language, args.speed, args.verbose, args.input_text
+                pipeline,
+                args.language,
+                args.speed,
+                args.verbose,
+                args.latency,
+                args.input_text,
+                args.input_file,
             )
-        elif args.input_text and args.is_srt_file:
+        elif args.input_file and args.is_srt_file:
             run_srt_cli(
                 pipeline,
                 args.language,
                 args.voice,
                 args.speed,
                 args.verbose,
-                args.input_text,  # This contains the SRT file path
+                args.latency,
+                args.input_file,
                 args.output_file,
             )
-        elif args.input_text:
+        elif args.input_text or args.input_file:
             run_cli(
                 pipeline,
                 args.language,
                 args.voice,
                 args.speed,
                 args.verbose,
+                args.latency,
                 args.input_text,
+                args.input_file,
                 args.output_file,
             )
         else:
@@ -167,6 +198,7 @@ def start(args: Args) -> None:
                 args.voice,
                 args.speed,
                 args.verbose,
+                args.latency,
                 args.history_off,
                 args.device,
                 args.ctrl_c,
@@ -180,6 +212,13 @@ def start(args: Args) -> None:
         console.print(f"[bold red]Error:[/] {str(e)}")
 
 
+def load_image_reader(language: str) -> "easyocr.Reader":
+    """Create the OCR reader, easyocr is only imported by the modes that use it"""
+    import easyocr
+
+    return easyocr.Reader([get_easyocr_language_map()[language]])
+
+
 def speak_thread(clipboard_data: str, player: TTSPlayer) -> None:
     """Player speak wrapper"""
     try:
@@ -188,6 +227,60 @@ def speak_thread(clipboard_data: str, player: TTSPlayer) -> None:
         print(f"Error in thread: {str(e)}")
 
 
+def decode_commands(data: bytes) -> List[Tuple[str, str | float]]:
+    """Decode binary daemon commands into (command, argument) pairs"""
+    commands = []
+    pos = 0
+    while pos < len(data):
+        op = data[pos]
+        pos += 1
+        cmd = OP_COMMANDS[op]
+        arg = ""
+        if op in OP_PAYLOADS:
+            fmt = OP_PAYLOADS[op]
+            (value,) = struct.unpack_from(fmt, data, pos)
+            pos += struct.calcsize(fmt)
+            if op == OP_SPEED:
+                arg = round(value, 3)  # Drop the f32 rounding noise
+            elif op == OP_LANG:
+                arg = list(get_language_map())[value]
+            elif op == OP_VOICE:
+                arg = get_voices()[value]
+        commands.append((cmd, arg))
+    return commands
+
+
+def recv_all(conn: socket.socket, buffer: bytearray) -> bytes:
+    """Read until the client closes its side, reusing and growing buffer"""
+    size = 0
+    while True:
+        if size == len(buffer):
+            buffer.extend(bytes(len(buffer)))
+        with memoryview(buffer) as view:
+            received = conn.recv_into(view[size:])
+        if not received:
+            break
+        size += received
+    with memoryview(buffer) as view:
+        return view[:size].tobytes()
+
+
+def bind_unix_socket(server_socket: socket.socket) -> None:
+    """Bind to SOCKET_PATH, replacing a socket left behind by a dead daemon"""
+    if os.path.exists(SOCKET_PATH):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            if probe.connect_ex(SOCKET_PATH) == 0:
+                raise OSError(errno.EADDRINUSE, "Address already in use")
+        os.unlink(SOCKET_PATH)
+    # Created owner-only, a chmod after bind() would leave a window where
+    # other users can connect, and the /tmp fallback is shared
+    umask = os.umask(0o177)
+    try:
+        server_socket.bind(SOCKET_PATH)
+    finally:
+        os.umask(umask)
+
+
 def run_daemon(
     pipeline: KPipeline,
     language: str,
@@ -195,18 +288,37 @@ def run_daemon(
     speed: float,
     device: Optional[str],
     verbose: bool,
+    latency: str | float,
     port: int,
-    image_reader: easyocr.Reader,
+    tcp: bool,
+    image_reader: "easyocr.Reader",
 ) -> None:
     """Start daemon mode"""
     current_thread = None
-    player = TTSPlayer(pipeline, language, voice, speed, verbose)
+    player = TTSPlayer(pipeline, language, voice, speed, verbose, latency=latency)
+    buffer = bytearray(RECV_BUFFER_SIZE)
+    # Commands that only call into the player, looked up before the others
+    playback_controls = {
+        "!pause": player.pause_playback,
+        "!resume": player.resume_playback,
+        "!back": player.back_sentence,
+        "!next": player.skip_sentence,
+    }
 
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
-            server_socket.bind((HOST, port))
+        family = socket.AF_INET if tcp else socket.AF_UNIX
+        with socket.socket(family, socket.SOCK_STREAM) as server_socket:
+            # Accepted connections inherit it, the kernel caps it at its maximum
+            server_socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE
+            )
+            if tcp:
+                server_socket.bind((HOST, port))
+                print(f"Listening on {HOST}:{port}...")
+            else:
+                bind_unix_socket(server_socket)
+                print(f"Listening on {SOCKET_PATH}...")
             server_socket.listen(1)
-            print(f"Listening on {HOST}:{port}...")
 
             while True:
                 conn, addr = server_socket.accept()
@@ -214,14 +326,20 @@ def run_daemon(
                     print(f"Connected by {addr}")
 
                     # Read all
-                    data = b""
-                    while True:
-                        chunk = conn.recv(4096)
-                        if not chunk:
-                            break
-                        data += chunk
-
-                    if data.startswith(b"IMAGE:"):
+                    data = recv_all(conn, buffer)
+
+                    if not data:
+                        continue
+
+                    commands = None
+                    if data[0] in OP_COMMANDS:
+                        try:
+                            commands = decode_commands(data)
+                        except (KeyError, IndexError, struct.error):
+                            print("Invalid command.")
+                            continue
+                        clipboard_data = ""
+                    elif data.startswith(b"IMAGE:"):
                         results = image_reader.readtext(data[6:])
                         clipboard_data = ""
                         clipboard_data = " ".join(
@@ -234,75 +352,77 @@ def run_daemon(
                     else:
                         clipboard_data = data.decode()
 
-                    print(f"Received {clipboard_data[:20]}...")
+                    if commands is not None:
+                        print(f"Received {len(commands)} command(s)")
+                    else:
+                        print(f"Received {clipboard_data[:20]}...")
 
-                # Handle commands
-                if clipboard_data.startswith("!"):
-                    parts = clipboard_data.split(maxsplit=1)
-                    cmd = parts[0].lower()
-                    arg = parts[1] if len(parts) > 1 else ""
-
-                    if cmd == "!lang":
-                        if player.change_language(arg, device):
-                            print(f"Language changed to: {player.languages[arg]}")
-
-                            easyocr_lang = [
-                                lang
-                                for code, lang in get_easyocr_language_map().items()
-                                if code == arg
-                            ]
-                            image_reader = easyocr.Reader(easyocr_lang)
-                        else:
-                            print("Invalid language code.")
+                if commands is None and clipboard_data.startswith("!"):
+                    # Text commands may be batched too, one per line
+                    commands = []
+                    for command in clipboard_data.splitlines():
+                        parts = command.split(maxsplit=1)
+                        if parts:
+                            arg = parts[1] if len(parts) > 1 else ""
+                            commands.append((parts[0].lower(), arg))
 
-                    elif cmd == "!voice":
-                        if player.change_voice(arg):
-                            print(f"Voice changed to: {arg}")
-                        else:
-                            print("Invalid voice.")
+                # Handle commands
+                if commands is not None:
+                    for cmd, arg in commands:
+                        control = playback_controls.get(cmd)
+                        if control is not None:
+                            control()
+                        elif cmd == "!lang":
+                            if player.change_language(arg, device):
+                                print(f"Language changed to: {player.languages[arg]}")
+                                image_reader = load_image_reader(arg)
+                            else:
+                                print("Invalid language code.")
 
-                    elif cmd == "!speed":
-                        try:
-                            new_speed = float(arg)
-                            if player.change_speed(new_speed):
-                                print(f"Speed changed to: {new_speed}")
+                        elif cmd == "!voice":
+                            if player.change_voice(arg):
+                                print(f"Voice changed to: {arg}")
                             else:
-                                print(
-                                    f"Speed must be between {MIN_SPEED} and {MAX_SPEED}"
-                                )
-                        except ValueError:
-                            print("Invalid speed value")
-
-                    elif cmd == "!pause":
-                        player.pause_playback()
-                    elif cmd == "!resume":
-                        player.resume_playback()
-                    elif cmd == "!back":
-                        player.back_sentence()
-                    elif cmd == "!next":
-                        player.skip_sentence()
-                    elif cmd in ("!stop", "!exit", "!status"):
-                        if current_thread is not None and current_thread.is_alive():
-                            print("Stopping previous playback...")
-                            player.stop_playback()
-                            current_thread.join()
-                        if cmd == "!exit":
-                            print("Exiting...")
+                                print("Invalid voice.")
+
+                        elif cmd == "!speed":
+                            try:
+                                new_speed = float(arg)
+                                if player.change_speed(new_speed):
+                                    print(f"Speed changed to: {new_speed}")
+                                else:
+                                    print(
+                                        "Speed must be between "
+                                        f"{MIN_SPEED} and {MAX_SPEED}"
+                                    )
+                            except ValueError:
+                                print("Invalid speed value")
+
+                        elif cmd in ("!stop", "!exit", "!status"):
                             if current_thread is not None and current_thread.is_alive():
                                 print("Stopping previous playback...")
                                 player.stop_playback()
                                 current_thread.join()
-                            sys.exit(0)
-                        if cmd == "!status":
-                            status_str = format_status(
-                                player.language, player.voice, player.speed
-                            )
-                            current_thread = threading.Thread(
-                                target=speak_thread,
-                                args=(status_str, player),
-                            )
-                            current_thread.daemon = True
-                            current_thread.start()
+                            if cmd == "!exit":
+                                print("Exiting...")
+                                if (
+                                    current_thread is not None
+                                    and current_thread.is_alive()
+                                ):
+                                    print("Stopping previous playback...")
+                                    player.stop_playback()
+                                    current_thread.join()
+                                sys.exit(0)
+                            if cmd == "!status":
+                                status_str = format_status(
+                                    player.language, player.voice, player.speed
+                                )
+                                current_thread = threading.Thread(
+                                    target=speak_thread,
+                                    args=(status_str, player),
+                                )
+                                current_thread.daemon = True
+                                current_thread.start()
                 else:
                     if current_thread is not None and current_thread.is_alive():
                         print("Stopping previous playback...")
@@ -332,10 +452,11 @@ def run_daemon(
             current_thread.join(timeout=1)
         try:
             if "Address already in use" in str(e):
-                print(f"Error: Port {port} is already in use.")
+                address = f"Port {port}" if tcp else SOCKET_PATH
+                print(f"Error: {address} is already in use.")
                 print("This could be due to:")
                 print("  - Another instance of this program running.")
-                print(f"  - A different process using port {port}.")
+                print(f"  - A different process using {address}.")
                 print("To resolve this:")
                 print(
                     "  - Check for and terminate any other instances of this program."
@@ -349,8 +470,10 @@ def run_daemon(
                 DEFAULT_VOICE,
                 DEFAULT_SPEED,
                 False,
+                latency,
                 f"Error: {str(e)[:40]}. for more info see logs. Exiting.",
                 None,
+                None,
             )
         except Exception as e:
             pass
@@ -361,20 +484,35 @@ def run_with_all(
     language: str,
     speed: float,
     verbose: bool,
-    input_text: str,
+    latency: str | float,
+    input_text: Optional[str],
+    input_file: Optional[str],
 ) -> None:
     """Run with all available voices"""
     console.print(
         f"\n[bold blue]Reading with all available {get_language_map()[language]} voices[/]\n"
     )
-    target_voices = [voice for voice in get_voices() if voice.startswith(language)]
+    target_voices = get_voices_by_lang()[language]
 
-    player = TTSPlayer(pipeline, language, target_voices[0], speed, verbose)
-    sentences = split_text_to_sentences(input_text, player.nltk_language)
+    player = TTSPlayer(
+        pipeline, language, target_voices[0], speed, verbose, latency=latency
+    )
+    if input_file is not None:
+        # Every voice reads the file, so the sentences are kept
+        sentences = list(iter_file_sentences(input_file, player.nltk_language))
+        label = input_file
+    else:
+        sentences = split_text_to_sentences(input_text, player.nltk_language)
+        label = input_text[:30]
+    # Nothing skips sentence by sentence here, so runs of short ones share
+    # a pipeline call
+    sentences = list(merge_short_sentences(sentences))
+    # G2P doesn't depend on the voice, the first voice's pass phonemizes for all
+    player.phoneme_memo = {}
     try:
         for voice in target_voices:
             player.change_voice(voice)
-            console.print(f"[cyan]{voice} speaking:[/] {input_text[:30]}")
+            console.print(f"[cyan]{voice} speaking:[/] {label}")
             player.speak(sentences, console_mode=False)
     except KeyboardInterrupt:
         console.print("[bold yellow]Exiting...[/]")
@@ -396,17 +534,25 @@ def run_cli(
     voice: str,
     speed: float,
     verbose: bool,
-    input_text: str,
+    latency: str | float,
+    input_text: Optional[str],
+    input_file: Optional[str],
     output_file: Optional[str],
 ) -> None:
     """Generate audio"""
-    player = TTSPlayer(pipeline, language, voice, speed, verbose)
-    sentences = split_text_to_sentences(input_text, player.nltk_language)
+    player = TTSPlayer(pipeline, language, voice, speed, verbose, latency=latency)
+    if input_file is not None:
+        sentences = iter_file_sentences(input_file, player.nltk_language)
+        label = input_file
+    else:
+        sentences = split_text_to_sentences(input_text, player.nltk_language)
+        label = f"{input_text[:30]}..."
+    # Nothing skips sentence by sentence here, so runs of short ones share
+    # a pipeline call
+    sentences = merge_short_sentences(sentences)
     if output_file is None:
         try:
-            with console.status(
-                f"[cyan]Speaking:[/] {input_text[:30]}...", spinner_style="cyan"
-            ):
+            with console.status(f"[cyan]Speaking:[/] {label}", spinner_style="cyan"):
                 player.speak(sentences, console_mode=False)
         except KeyboardInterrupt:
             console.print("[bold yellow]Exiting...[/]")
@@ -430,11 +576,12 @@ def run_srt_cli(
     voice: str,
     speed: float,
     verbose: bool,
+    latency: str | float,
     srt_file: str,
     output_file: Optional[str],
 ) -> None:
     """Generate timed audio from SRT file"""
-    player = TTSPlayer(pipeline, language, voice, speed, verbose)
+    player = TTSPlayer(pipeline, language, voice, speed, verbose, latency=latency)
     
     if output_file is None:
         output_file = "srt_output.wav"
@@ -452,11 +599,12 @@ def run_srt_cli(
 
 
 def run_console(
-    pipeline: KPipeline,
+    pipeline: "KPipeline | Future[KPipeline]",
     language: str,
     voice: str,
     speed: float,
     verbose: bool,
+    latency: str | float,
     history_off: bool,
     device: Optional[str],
     ctrlc: bool,
@@ -464,7 +612,43 @@ def run_console(
 ) -> None:
     """Run an interactive TTS session with dynamic settings."""
 
-    player = TTSPlayer(pipeline, language, voice, speed, verbose, ctrlc)
+    player = TTSPlayer(pipeline, language, voice, speed, verbose, ctrlc, latency)
+
+    def ensure_pipeline() -> None:
+        """Wait for the background load, ending the session if it failed"""
+        if player.pipeline_ready():
+            return
+        try:
+            with console.status(
+                "[yellow]Initializing Kokoro pipeline...[/]",
+                spinner="dots",
+                spinner_style="yellow",
+                speed=0.8,
+            ):
+                player.wait_for_pipeline()
+        except Exception as e:
+            console.print(f"[bold red]Error:[/] Failed to load the pipeline: {e}")
+            sys.exit(1)
+        console.print("[bold green]Kokoro pipeline initialized!")
+
+    # Commands without an argument that need nothing from the loop
+    simple_commands = {
+        "!s": player.stop_playback,
+        "!stop": player.stop_playback,
+        "!p": player.pause_playback,
+        "!pause": player.pause_playback,
+        "!r": player.resume_playback,
+        "!resume": player.resume_playback,
+        "!b": player.back_sentence,
+        "!back": player.back_sentence,
+        "!n": player.skip_sentence,
+        "!next": player.skip_sentence,
+        "!list_langs": display_languages,
+        "!list_all_voices": display_voices,
+        "!h": display_help,
+        "!help": display_help,
+        "!clear_history": clear_history,
+    }
 
     console.rule("[bold green]Interactive TTS started[/]")
     display_help()
@@ -477,6 +661,10 @@ def run_console(
     global running_threads
     while True:
         try:
+            # A load that failed while waiting at the prompt ends the session
+            if not player.pipeline_ready() and pipeline.done():
+                ensure_pipeline()
+
             user_input = get_input(history_off, prompt)
             if not user_input:
                 continue
@@ -487,7 +675,12 @@ def run_console(
                 cmd = parts[0].lower()
                 arg = parts[1] if len(parts) > 1 else ""
 
-                if cmd == "!lang":
+                command = simple_commands.get(cmd)
+                if command is not None:
+                    command()
+
+                elif cmd == "!lang":
+                    ensure_pipeline()
                     if player.change_language(arg, device):
                         console.print(
                             f"[green]Language changed to:[/] {player.languages[arg]}"
@@ -515,33 +708,9 @@ def run_console(
                     except ValueError:
                         console.print("[red]Invalid speed value[/]")
 
-                elif cmd in ("!s", "!stop"):
-                    player.stop_playback()
-
-                elif cmd in ("!p", "!pause"):
-                    player.pause_playback()
-
-                elif cmd in ("!r", "!resume"):
-                    player.resume_playback()
-
-                elif cmd in ("!b", "!back"):
-                    player.back_sentence()
-
-                elif cmd in ("!n", "!next"):
-                    player.skip_sentence()
-
-                elif cmd == "!list_langs":
-                    display_languages()
-
                 elif cmd == "!list_voices":
                     display_voices(player.language)
 
-                elif cmd == "!list_all_voices":
-                    display_voices()
-
-                elif cmd in ("!help", "!h"):
-                    display_help()
-
                 elif cmd in ("!quit", "!q"):
                     console.print("[bold yellow]Exiting...[/]")
                     if threading.active_count() > running_threads:
@@ -557,9 +726,6 @@ def run_console(
                 elif cmd == "!clear":
                     print("\033[H\033[J", end="")
 
-                elif cmd == "!clear_history":
-                    clear_history()
-
                 elif cmd == "!ctrlc":
                     player.ctrlc = not player.ctrlc
                     if player.ctrlc:
@@ -567,7 +733,7 @@ def run_console(
                     else:
                         console.print("[green]Ctrl+C gives a new line")
 
-                elif cmd in ("!status", "!h"):
+                elif cmd == "!status":
                     display_status(player.language, player.voice, player.speed)
 
                 elif cmd == "!verbose":
@@ -578,6 +744,9 @@ def run_console(
 
                 continue
 
+            # The loading thread isn't playback, let it finish first
+            ensure_pipeline()
+
             # Stop if previous playback still running
             if threading.active_count() > running_threads:
                 player.stop_playback(False)
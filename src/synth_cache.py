@@ -0,0 +1,86 @@
+import hashlib
+import os
+import threading
+from typing import Iterable, Optional
+
+import numpy as np
+
+from config import CACHE_DIR, CACHE_MAX_BYTES
+
+# Set by enable(), the cache is off until then
+cache_dir: Optional[str] = None
+cache_size = 0
+
+
+def enable(path: str = CACHE_DIR) -> None:
+    """Turn on the on-disk synthesis cache"""
+    global cache_dir, cache_size
+    os.makedirs(path, exist_ok=True)
+    cache_dir = path
+    cache_size = sum(
+        entry.stat().st_size for entry in os.scandir(path) if entry.is_file()
+    )
+
+
+def entry_path(text: str, voice: str, language: str, speed: float) -> str:
+    """Return the file holding the audio for a sentence"""
+    key = hashlib.sha256(f"{text}\0{voice}\0{language}\0{speed}".encode()).hexdigest()
+    return os.path.join(cache_dir, key)
+
+
+def get(text: str, voice: str, language: str, speed: float) -> Optional[np.ndarray]:
+    """Return the cached 16-bit PCM for a sentence, if any"""
+    if cache_dir is None:
+        return None
+    path = entry_path(text, voice, language, speed)
+    try:
+        audio = np.fromfile(path, dtype=np.int16)
+        os.utime(path)  # Mark as recently used
+    except OSError:
+        return None
+    return audio
+
+
+def put(
+    text: str, voice: str, language: str, speed: float, chunks: Iterable[np.ndarray]
+) -> None:
+    """Store the 16-bit PCM chunks generated for a sentence"""
+    global cache_size
+    if cache_dir is None:
+        return
+    path = entry_path(text, voice, language, speed)
+    # Written aside first so a reader never sees a partial entry
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    size = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk.tobytes())
+                size += chunk.nbytes
+        os.replace(tmp_path, path)
+    except OSError:
+        return
+    cache_size += size
+    if cache_size > CACHE_MAX_BYTES:
+        evict()
+
+
+def evict() -> None:
+    """Remove the least recently used entries down to 3/4 of the size limit"""
+    global cache_size
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+
+    cache_size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if cache_size <= CACHE_MAX_BYTES * 3 // 4:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        cache_size -= size
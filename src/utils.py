@@ -1,9 +1,25 @@
+import atexit
+import codecs
+import mmap
 import os
 import platform
 import re
+from bisect import bisect_left
 from dataclasses import dataclass
 from datetime import timedelta
-from typing import Dict, List, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
 
 if platform.system() == "Windows":
     import pyreadline3 as readline
@@ -14,24 +30,32 @@ from nltk import sent_tokenize
 from rich import box
 from rich.table import Table
 
-from config import COMMANDS, HISTORY_FILE, HISTORY_LIMIT, console
+from config import COMMANDS, FILE_CHUNK_SIZE, HISTORY_FILE, HISTORY_LIMIT, console
 
+last_history_line: Optional[str] = None
+unsaved_history = 0  # Lines added since the history file was last written
 
-def get_language_map() -> Dict[str, str]:
+
+@lru_cache(maxsize=None)
+def get_language_map() -> Mapping[str, str]:
     """Return the available languages"""
-    return {
-        "a": "American English",
-        "b": "British English",
-        "e": "Spanish",
-        "f": "French",
-        "h": "Hindi",
-        "i": "Italian",
-        "p": "Brazilian Portuguese",
-        "j": "Japanese",
-        "z": "Mandarin Chinese",
-    }
+    # Read-only, the cached mapping is shared by every caller
+    return MappingProxyType(
+        {
+            "a": "American English",
+            "b": "British English",
+            "e": "Spanish",
+            "f": "French",
+            "h": "Hindi",
+            "i": "Italian",
+            "p": "Brazilian Portuguese",
+            "j": "Japanese",
+            "z": "Mandarin Chinese",
+        }
+    )
 
 
+@lru_cache(maxsize=None)
 def get_easyocr_language_map() -> Dict[str, str]:
     """Return the available languages for EasyOCR"""
     return {
@@ -47,9 +71,10 @@ def get_easyocr_language_map() -> Dict[str, str]:
     }
 
 
-def get_voices() -> List[str]:
+@lru_cache(maxsize=None)
+def get_voices() -> Tuple[str, ...]:
     """Return the available voices"""
-    return [
+    return (
         "af_alloy",
         "af_aoede",
         "af_bella",
@@ -104,9 +129,28 @@ def get_voices() -> List[str]:
         "zm_yunxi",
         "zm_yunxia",
         "zm_yunyang",
-    ]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_voices_by_lang() -> Mapping[str, Tuple[str, ...]]:
+    """Return the available voices grouped by language code"""
+    voices_by_lang: Dict[str, List[str]] = {}
+    for voice in get_voices():
+        voices_by_lang.setdefault(voice[0], []).append(voice)
+    # Read-only, the cached mapping is shared by every caller
+    return MappingProxyType(
+        {lang: tuple(voices) for lang, voices in voices_by_lang.items()}
+    )
+
+
+@lru_cache(maxsize=None)
+def get_voice_set() -> FrozenSet[str]:
+    """Return the available voices as a set for membership checks"""
+    return frozenset(get_voices())
 
 
+@lru_cache(maxsize=None)
 def get_gui_themes() -> Dict[int, str]:
     """Return the available gui themes"""
     return {
@@ -136,6 +180,7 @@ def display_themes() -> None:
     console.print(table)
 
 
+@lru_cache(maxsize=None)
 def get_nltk_language_map() -> Dict[str, str]:
     """Return available languages in nltk"""
     return {
@@ -149,14 +194,29 @@ def get_nltk_language_map() -> Dict[str, str]:
 
 
 def get_nltk_language(language_code: str) -> str:
-    return next(
-        (
-            lang
-            for code, lang in get_nltk_language_map().items()
-            if code == language_code
-        ),
-        "english",
-    )
+    return get_nltk_language_map().get(language_code, "english")
+
+
+def check_language_voice(
+    language: str, voice: Optional[str], match_language=True
+) -> Optional[Tuple[str, Callable[[], None]]]:
+    """Validate a language and voice
+
+    Returns None when both are valid, otherwise the error message and the
+    function that lists the valid choices.
+    """
+    # The voice goes first, doki derives the language from it when not given
+    if voice is not None and voice not in get_voice_set():
+        return f"Invalid voice '{voice}'", display_voices
+    lang_map = get_language_map()
+    if language not in lang_map:
+        return f"Invalid language '{language}'", display_languages
+    if voice is not None and match_language and not voice.startswith(language):
+        return (
+            f"Voice '{voice}' is not made for language '{lang_map[language]}'",
+            display_voices,
+        )
+    return None
 
 
 def display_languages() -> None:
@@ -174,7 +234,6 @@ def display_languages() -> None:
 
 def display_voices(language=None) -> None:
     """Display available voices in a formatted table."""
-    voices = get_voices()
     table = Table(title="Available Voices", box=box.ROUNDED)
     table.add_column("Voice ID", style="cyan")
     table.add_column("Prefix", style="yellow")
@@ -184,22 +243,26 @@ def display_voices(language=None) -> None:
         display_languages()
         return
 
+    if language is None:
+        voices = get_voices()
+    else:
+        voices = get_voices_by_lang().get(language, ())
+
+    prefix_descs = {
+        "a": "American",
+        "b": "British",
+        "e": "Spanish",
+        "f": "French",
+        "h": "Hindi",
+        "i": "Italian",
+        "p": "Portuguese",
+        "j": "Japanese",
+        "z": "Mandarin",
+    }
     for voice in voices:
-        prefix, _ = voice.split("_", 1)
-        if language is None or language == prefix[0]:
-            prefix_desc = {
-                "a": "American",
-                "b": "British",
-                "e": "Spanish",
-                "f": "French",
-                "h": "Hindi",
-                "i": "Italian",
-                "p": "Portuguese",
-                "j": "Japanese",
-                "z": "Mandarin",
-            }.get(prefix[0], "Unknown")
-            gender = "Female" if prefix[1] == "f" else "Male"
-            table.add_row(voice, f"{prefix_desc} {gender}")
+        prefix_desc = prefix_descs.get(voice[0], "Unknown")
+        gender = "Female" if voice[1] == "f" else "Male"
+        table.add_row(voice, f"{prefix_desc} {gender}")
 
     console.print(table)
 
@@ -297,6 +360,9 @@ def display_help() -> None:
 
 
 def clear_history() -> None:
+    global last_history_line, unsaved_history
+    last_history_line = None
+    unsaved_history = 0
     readline.clear_history()
     if platform.system() != "Windows":
         try:
@@ -306,14 +372,33 @@ def clear_history() -> None:
     console.print("[bold yellow]History cleared.[/]")
 
 
-def save_history(history_off: bool) -> None:
-    if platform.system() == "Windows":
+def save_history(line: str) -> None:
+    """Add a line to the history, it is written to the file on exit"""
+    global last_history_line, unsaved_history
+    if platform.system() == "Windows" or not line or line == last_history_line:
         return
-    if not history_off:
+    last_history_line = line
+    readline.add_history(line)
+    unsaved_history += 1
+
+
+def flush_history() -> None:
+    """Append the lines entered this session to the history file"""
+    global unsaved_history
+    count = min(unsaved_history, readline.get_current_history_length())
+    unsaved_history = 0
+    if count == 0:
+        return
+    try:
+        # Appends only the new entries, readline truncates to the history length
+        readline.append_history_file(count, HISTORY_FILE)
+    except FileNotFoundError:
         try:
             readline.write_history_file(HISTORY_FILE)
         except IOError:
             console.print("[bold red]Error saving history file.[/]")
+    except IOError:
+        console.print("[bold red]Error saving history file.[/]")
 
 
 def init_history(history_off: bool) -> None:
@@ -327,6 +412,9 @@ def init_history(history_off: bool) -> None:
             except IOError:
                 pass
         readline.set_history_length(HISTORY_LIMIT)
+        atexit.register(flush_history)
+        # Lines are added by save_history so they can be appended to the file
+        readline.set_auto_history(False)
 
 
 def init_completer() -> None:
@@ -338,11 +426,23 @@ def init_completer() -> None:
     readline.parse_and_bind("set completion-ignore-case on")
 
 
+# Sorted once so completion is a binary search
+sorted_commands = tuple(sorted(COMMANDS))
+
+
+def complete(prefix: str) -> Tuple[str, ...]:
+    """Return the commands starting with prefix"""
+    start = bisect_left(sorted_commands, prefix)
+    end = bisect_left(sorted_commands, prefix + "\uffff")
+    return sorted_commands[start:end]
+
+
 def completer(text: str, state: int) -> Optional[str]:
     """Auto-complete function for readline."""
     if platform.system() == "Windows":
         return None
-    options = [cmd for cmd in COMMANDS if cmd.startswith(text)]
+    # readline asks once per state, two bisections make that cheap
+    options = complete(text)
     return options[state] if state < len(options) else None
 
 
@@ -415,25 +515,22 @@ def split_long_sentence(sentence: str, max_len=350, min_len=50) -> List[str]:
     return [chunk for chunk in chunks if chunk]
 
 
-def merge_short_sentences(sentences: list[str], min_len=50, max_len=300) -> list[str]:
+def merge_short_sentences(
+    sentences: Iterable[str], min_len=50, max_len=300
+) -> Iterator[str]:
     """Merge those shorter than min_len with the next sentence"""
-    if not sentences:
-        return []
-
-    result = []
-    current_sentence = sentences[0]
-
-    for i in range(1, len(sentences)):
-        if len(current_sentence) < min_len and len(sentences[i]) < max_len:
-            current_sentence += sentences[i]
+    current_sentence = None
+    for sentence in sentences:
+        if current_sentence is None:
+            current_sentence = sentence
+        elif len(current_sentence) < min_len and len(sentence) < max_len:
+            current_sentence = f"{current_sentence} {sentence}"
         else:
-            result.append(current_sentence)
-            current_sentence = sentences[i]
+            yield current_sentence
+            current_sentence = sentence
 
     if current_sentence:
-        result.append(current_sentence)
-
-    return result
+        yield current_sentence
 
 
 def split_text_to_sentences(text: str, language: str) -> List[str]:
@@ -451,6 +548,60 @@ def split_text_to_sentences(text: str, language: str) -> List[str]:
     return new_sentences
 
 
+def check_utf8(path: str, chunk_size=FILE_CHUNK_SIZE) -> None:
+    """Raise ValueError if a file isn't valid UTF-8, reading it slice by slice"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            for pos in range(0, len(mm), chunk_size):
+                # Bytes of a character left over from the previous slice
+                pending = len(decoder.getstate()[0])
+                try:
+                    decoder.decode(mm[pos : pos + chunk_size])
+                except UnicodeDecodeError as e:
+                    raise ValueError(
+                        f"Not valid UTF-8 text (byte {pos - pending + e.start})"
+                    ) from None
+            try:
+                decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                raise ValueError("Not valid UTF-8 text (ends mid-character)") from None
+
+
+def iter_file_chunks(path: str, chunk_size=FILE_CHUNK_SIZE) -> Iterator[str]:
+    """Yield a text file in chunks that end on a line or sentence boundary"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            size = len(mm)
+            while pos < size:
+                end = min(pos + chunk_size, size)
+                if end < size:
+                    # Prefer a line break, then a sentence end, inside the window
+                    cut = mm.rfind(b"\n", pos, end)
+                    if cut == -1:
+                        cut = max(mm.rfind(c, pos, end) for c in (b".", b"!", b"?"))
+                    if cut != -1:
+                        end = cut + 1
+                    else:
+                        # Don't split a multi-byte UTF-8 character
+                        while end > pos + 1 and mm[end] & 0xC0 == 0x80:
+                            end -= 1
+                yield mm[pos:end].decode("utf-8")
+                pos = end
+
+
+def iter_file_sentences(path: str, language: str) -> Iterator[str]:
+    """Yield the sentences of a text file without loading it all at once"""
+    for chunk in iter_file_chunks(path):
+        if chunk.strip():
+            yield from split_text_to_sentences(chunk, language)
+
+
 @dataclass
 class SRTEntry:
     """Represents a single SRT subtitle entry"""
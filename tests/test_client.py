@@ -0,0 +1,39 @@
+import pytest
+
+import client
+from client import Action, parse_args, parse_simple_args
+
+
+@pytest.fixture
+def argv(monkeypatch):
+    # parse_args updates the connection settings as it goes
+    monkeypatch.setattr(client, "USE_TCP", client.USE_TCP)
+    monkeypatch.setattr(client, "PORT", client.PORT)
+    return lambda *args: monkeypatch.setattr("sys.argv", ["kokorodoki", *args])
+
+
+def test_parse_args(argv):
+    argv("--voice=af_heart", "--language=a", "--next")
+    assert parse_args() == (Action.NEXT, None, "a", "af_heart", False, False)
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        ([], (Action.NONE, None, None, None, False, False)),
+        (["-c"], (Action.NONE, None, None, None, False, True)),
+        (["--clipboard"], (Action.NONE, None, None, None, False, True)),
+        (["--status"], (Action.NONE, None, None, None, True, False)),
+        (["--pause"], (Action.PAUSE, None, None, None, False, False)),
+        (["--exit"], (Action.EXIT, None, None, None, False, False)),
+    ],
+)
+def test_parse_simple_args(args, expected):
+    assert parse_simple_args(args) == expected
+
+
+@pytest.mark.parametrize(
+    "args", [["--speed", "1.2"], ["--stop", "--status"], ["-h"], ["--none"]]
+)
+def test_parse_simple_args_leaves_the_rest_to_argparse(args):
+    assert parse_simple_args(args) is None
@@ -0,0 +1,12 @@
+from config import normalize_long_options
+
+
+def test_normalize_long_options():
+    argv = ["--list_voices=en_US", "--ctrl_c_off", "-t", "snake_case", "--voice"]
+    assert normalize_long_options(argv) == [
+        "--list-voices=en_US",
+        "--ctrl-c-off",
+        "-t",
+        "snake_case",
+        "--voice",
+    ]
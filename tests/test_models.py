@@ -0,0 +1,133 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from models import TTSPlayer, prefetch, to_pcm16, trim_audio
+
+
+def reference_trim(audio, top_db=60, frame_length=2048, hop_length=512, amin=1e-5):
+    """librosa.effects.trim written out: centered RMS frames in dB against the max"""
+    half = frame_length // 2
+    padded = np.pad(audio.astype(np.float64), half)
+    rms = np.sqrt(
+        [
+            np.mean(padded[i : i + frame_length] ** 2)
+            for i in range(0, len(audio) + 1, hop_length)
+        ]
+    )
+    db = 20 * np.log10(np.maximum(amin, rms)) - 20 * np.log10(max(amin, rms.max()))
+    non_silent = np.flatnonzero(db > -top_db)
+    if non_silent.size == 0:
+        return audio[:0]
+    start = non_silent[0] * hop_length
+    end = min(len(audio), (non_silent[-1] + 1) * hop_length)
+    return audio[start:end]
+
+
+def burst(scale: float, seed: int) -> np.ndarray:
+    """Noise with a loud middle section over a faint floor"""
+    rng = np.random.default_rng(seed)
+    envelope = np.full(24000, 1e-3)
+    envelope[6000:15000] = 1.0
+    return (rng.standard_normal(24000) * envelope * scale).astype(np.float32)
+
+
+@pytest.mark.parametrize("scale", [1.0, 1e-2, 1e-4, 1e-5, 1e-6])
+@pytest.mark.parametrize("seed", range(5))
+def test_trim_audio_matches_reference(scale, seed):
+    audio = burst(scale, seed)
+    np.testing.assert_array_equal(trim_audio(audio), reference_trim(audio))
+
+
+def test_trim_audio_keeps_quiet_chunks_whole():
+    # Below amin every frame is at the floor, so nothing counts as silence
+    audio = burst(1e-6, 0)
+    assert len(trim_audio(audio)) == len(audio)
+
+
+def test_trim_audio_silence():
+    audio = np.zeros(5000, dtype=np.float32)
+    assert len(trim_audio(audio)) == len(audio)
+    assert len(trim_audio(audio[:0])) == 0
+
+
+def test_trim_audio_matches_librosa():
+    librosa = pytest.importorskip("librosa")
+    for scale in (1.0, 1e-4, 1e-5):
+        audio = burst(scale, 1)
+        expected, _ = librosa.effects.trim(audio, top_db=60)
+        np.testing.assert_array_equal(trim_audio(audio), expected)
+
+
+def test_to_pcm16_scales_and_clips():
+    audio = np.array([0.0, 0.5, -0.5, 1.0, -1.0, 1.5, -1.5], dtype=np.float32)
+    pcm = to_pcm16(audio)
+    assert pcm.dtype == np.int16
+    assert pcm.tolist() == [0, 16383, -16383, 32767, -32767, 32767, -32768]
+
+
+def test_prefetch_yields_in_order():
+    assert list(prefetch(iter(range(10)), 2)) == list(range(10))
+
+
+def test_prefetch_reraises_producer_errors():
+    def items():
+        yield 1
+        raise ValueError("bad item")
+
+    with pytest.raises(ValueError, match="bad item"):
+        list(prefetch(items(), 2))
+
+
+def test_prefetch_waits_for_the_producer_when_closed():
+    finished = threading.Event()
+
+    def items():
+        try:
+            for i in range(100):
+                time.sleep(0.01)
+                yield i
+        finally:
+            finished.set()
+
+    prepared = prefetch(items(), 2)
+    assert next(prepared) == 0
+    prepared.close()
+    assert finished.is_set()
+
+
+class FakeTensor:
+    def __init__(self, array):
+        self.array = array
+
+    def numpy(self):
+        return self.array
+
+
+def file_player(fail_after=None):
+    """A player whose pipeline yields noise bursts, raising after fail_after"""
+    pytest.importorskip("soundfile")
+
+    def pipeline(sentence, **kwargs):
+        for i in range(3):
+            if i == fail_after:
+                raise RuntimeError("pipeline failed")
+            yield SimpleNamespace(audio=FakeTensor(burst(1.0, i)))
+
+    return TTSPlayer(pipeline, "a", "af_heart", 1.0, False)
+
+
+def test_generate_audio_file_writes_the_output(tmp_path):
+    output_file = tmp_path / "out.wav"
+    file_player().generate_audio_file("Hello.", str(output_file))
+    assert output_file.stat().st_size > 0
+    assert [path.name for path in tmp_path.iterdir()] == ["out.wav"]
+
+
+def test_generate_audio_file_leaves_nothing_on_error(tmp_path):
+    output_file = tmp_path / "out.wav"
+    file_player(fail_after=2).generate_audio_file("Hello.", str(output_file))
+    assert list(tmp_path.iterdir()) == []
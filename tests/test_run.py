@@ -0,0 +1,74 @@
+import os
+import socket
+import stat
+import struct
+
+import pytest
+
+pytest.importorskip("kokoro")
+
+from config import OP_EXIT, OP_LANG, OP_SPEED, OP_STATUS, OP_STOP, OP_VOICE
+import run
+from run import bind_unix_socket, decode_commands, recv_all
+from utils import get_language_map, get_voices
+
+
+def test_decode_commands():
+    languages = list(get_language_map())
+    voices = get_voices()
+    data = b"".join(
+        [
+            bytes([OP_STOP]),
+            struct.pack("<Bf", OP_SPEED, 1.3),
+            struct.pack("<BB", OP_LANG, 1),
+            struct.pack("<BH", OP_VOICE, 2),
+            bytes([OP_STATUS, OP_EXIT]),
+        ]
+    )
+    assert decode_commands(data) == [
+        ("!stop", ""),
+        ("!speed", 1.3),
+        ("!lang", languages[1]),
+        ("!voice", voices[2]),
+        ("!status", ""),
+        ("!exit", ""),
+    ]
+
+
+def test_decode_commands_empty():
+    assert decode_commands(b"") == []
+
+
+def test_recv_all_grows_the_buffer():
+    message = bytes(range(256)) * 40
+    buffer = bytearray(64)
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(message)
+        left.shutdown(socket.SHUT_WR)
+        assert recv_all(right, buffer) == message
+    assert len(buffer) >= len(message)
+
+
+def test_recv_all_reuses_the_buffer():
+    buffer = bytearray(64)
+    for message in (b"x" * 50, b"short"):
+        left, right = socket.socketpair()
+        with left, right:
+            left.sendall(message)
+            left.shutdown(socket.SHUT_WR)
+            assert recv_all(right, buffer) == message
+    assert len(buffer) == 64
+
+
+def test_bind_unix_socket_is_owner_only(tmp_path, monkeypatch):
+    path = str(tmp_path / "kokorodoki.sock")
+    monkeypatch.setattr(run, "SOCKET_PATH", path)
+    umask = os.umask(0o022)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            bind_unix_socket(server)
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        assert os.umask(0o022) == 0o022
+    finally:
+        os.umask(umask)
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+import synth_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(synth_cache, "cache_dir", None)
+    monkeypatch.setattr(synth_cache, "cache_size", 0)
+    synth_cache.enable(str(tmp_path))
+    return tmp_path
+
+
+def pcm(*values: int) -> np.ndarray:
+    return np.array(values, dtype=np.int16)
+
+
+def test_disabled_cache_stores_nothing(monkeypatch):
+    monkeypatch.setattr(synth_cache, "cache_dir", None)
+    synth_cache.put("Hi.", "af_heart", "a", 1.0, [pcm(1, 2)])
+    assert synth_cache.get("Hi.", "af_heart", "a", 1.0) is None
+
+
+def test_put_then_get_joins_the_chunks(cache):
+    synth_cache.put("Hi.", "af_heart", "a", 1.0, [pcm(1, 2), pcm(-3)])
+    np.testing.assert_array_equal(
+        synth_cache.get("Hi.", "af_heart", "a", 1.0), pcm(1, 2, -3)
+    )
+    assert synth_cache.cache_size == 6
+    assert not [name for name in os.listdir(cache) if name.endswith(".tmp")]
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        ("Bye.", "af_heart", "a", 1.0),
+        ("Hi.", "am_adam", "a", 1.0),
+        ("Hi.", "af_heart", "b", 1.0),
+        ("Hi.", "af_heart", "a", 1.2),
+    ],
+)
+def test_entries_are_keyed_on_every_setting(cache, key):
+    synth_cache.put("Hi.", "af_heart", "a", 1.0, [pcm(1)])
+    assert synth_cache.get(*key) is None
+
+
+def test_enable_counts_existing_entries(cache, monkeypatch):
+    synth_cache.put("Hi.", "af_heart", "a", 1.0, [pcm(1, 2, 3)])
+    monkeypatch.setattr(synth_cache, "cache_size", 0)
+    synth_cache.enable(str(cache))
+    assert synth_cache.cache_size == 6
+
+
+def test_evict_drops_least_recently_used(cache, monkeypatch):
+    monkeypatch.setattr(synth_cache, "CACHE_MAX_BYTES", 14)
+    for i, text in enumerate(("One.", "Two.", "Three.")):
+        synth_cache.put(text, "af_heart", "a", 1.0, [pcm(i, i)])
+        path = synth_cache.entry_path(text, "af_heart", "a", 1.0)
+        os.utime(path, (i, i))
+    # Reading an entry marks it as recently used
+    assert synth_cache.get("One.", "af_heart", "a", 1.0) is not None
+
+    synth_cache.put("Four.", "af_heart", "a", 1.0, [pcm(4, 4)])
+
+    assert synth_cache.get("Two.", "af_heart", "a", 1.0) is None
+    assert synth_cache.get("Three.", "af_heart", "a", 1.0) is None
+    assert synth_cache.get("One.", "af_heart", "a", 1.0) is not None
+    assert synth_cache.get("Four.", "af_heart", "a", 1.0) is not None
+    assert synth_cache.cache_size == 8
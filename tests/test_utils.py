@@ -0,0 +1,96 @@
+import pytest
+
+import utils
+from utils import check_utf8, iter_file_chunks, merge_short_sentences
+
+
+def test_merge_short_sentences_joins_runs_of_short_ones():
+    sentences = ["Hi.", "How are you?", "x" * 60, "Bye."]
+    assert list(merge_short_sentences(sentences)) == [
+        "Hi. How are you? " + "x" * 60,
+        "Bye.",
+    ]
+
+
+def test_merge_short_sentences_keeps_long_ones_apart():
+    sentences = ["Short.", "y" * 300, "z" * 60]
+    assert list(merge_short_sentences(sentences)) == sentences
+
+
+def test_merge_short_sentences_is_lazy():
+    def sentences():
+        yield "a" * 60
+        yield "b" * 60
+        raise AssertionError("read past the first merged sentence")
+
+    assert next(merge_short_sentences(sentences())) == "a" * 60
+
+
+def test_merge_short_sentences_empty():
+    assert list(merge_short_sentences([])) == []
+
+
+def test_iter_file_chunks_cuts_on_line_breaks(tmp_path):
+    path = tmp_path / "text.txt"
+    text = "".join(f"Line number {i}.\n" for i in range(50))
+    path.write_text(text)
+    chunks = list(iter_file_chunks(str(path), chunk_size=64))
+    assert "".join(chunks) == text
+    assert all(chunk.endswith("\n") for chunk in chunks)
+    assert all(len(chunk.encode()) <= 64 for chunk in chunks)
+
+
+def test_iter_file_chunks_keeps_multibyte_characters_whole(tmp_path):
+    path = tmp_path / "text.txt"
+    text = "日本語のテキスト" * 40
+    path.write_text(text, encoding="utf-8")
+    chunks = list(iter_file_chunks(str(path), chunk_size=16))
+    assert "".join(chunks) == text
+    assert len(chunks) > 1
+
+
+def test_iter_file_chunks_empty_file(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_bytes(b"")
+    assert list(iter_file_chunks(str(path))) == []
+
+
+def test_iter_file_sentences_skips_blank_chunks(monkeypatch):
+    chunks = ["One. Two.\n", "\n\n  \n", "Three.\n"]
+    monkeypatch.setattr(utils, "iter_file_chunks", lambda path: iter(chunks))
+    monkeypatch.setattr(
+        utils, "split_text_to_sentences", lambda text, language: text.split()
+    )
+    sentences = utils.iter_file_sentences("text.txt", "english")
+    assert list(sentences) == ["One.", "Two.", "Three."]
+
+
+def test_check_utf8_accepts_characters_across_slices(tmp_path):
+    path = tmp_path / "text.txt"
+    path.write_text("é" * 101, encoding="utf-8")
+    check_utf8(str(path), chunk_size=7)
+    (tmp_path / "empty.txt").write_bytes(b"")
+    check_utf8(str(tmp_path / "empty.txt"))
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        (b"a" * 20 + b"\xff" + b"a" * 20, "byte 20"),
+        # The bad sequence starts at the end of the first slice
+        (("é" * 3).encode() + b"\xc3\x28", "byte 6"),
+        (("é" * 3).encode() + b"\xc3", "mid-character"),
+    ],
+)
+def test_check_utf8_rejects_invalid_bytes(tmp_path, data, message):
+    path = tmp_path / "text.txt"
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match=message):
+        check_utf8(str(path), chunk_size=7)
+
+
+def test_get_voices_by_lang_is_read_only():
+    voices_by_lang = utils.get_voices_by_lang()
+    assert "af_heart" in voices_by_lang["a"]
+    with pytest.raises(TypeError):
+        voices_by_lang["a"] = ()